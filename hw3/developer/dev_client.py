@@ -32,8 +32,18 @@ def handle_connect(payload):
     except Exception as e:
         print(f"[Error] Failed to launch game: {e}", flush=True)
 
-def handle_save(payload):
+def handle_save(sock, payload):
     file_path = payload["path"]
+
+    # Streamed files arrive in chunks right after this message
+    if payload.get("stream"):
+        try:
+            netutils.recv_file(sock, file_path)
+            print(f"[Client] Saved file to: {file_path}", flush=True)
+        except (ValueError, OSError) as e:
+            print(f"[Error] Failed to save file: {e}", flush=True)
+        return
+
     file_data = payload["file data"]
     
     directory = os.path.dirname(file_path)
@@ -56,6 +66,16 @@ def handle_upload(sock, payload):
         netutils.send_msg(sock, {"response": "error"})
         return
 
+    # Streamed upload: announce the file, then send it in chunks
+    if payload.get("stream"):
+        try:
+            netutils.send_msg(sock, {"response": "success", "size": os.path.getsize(file_path)})
+            print(f"[Upload] Streaming file: {file_path}", flush=True)
+            netutils.send_file(sock, file_path)
+        except OSError as e:
+            print(f"[Error] Failed to stream file: {e}", flush=True)
+        return
+
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
@@ -122,6 +142,7 @@ def main():
     
     try:
         sock.connect((constants.DEV_HOST, constants.DEV_PORT))
+        netutils.negotiate(sock)
         print(f"[Client] Connected to {constants.DEV_HOST}:{constants.DEV_PORT}", flush=True)
     except ConnectionRefusedError:
         print("[Client] Server not available.", flush=True)
@@ -142,7 +163,7 @@ def main():
                 if op == "connect":
                     handle_connect(msg)
                 elif op == "save":
-                    handle_save(msg)
+                    handle_save(sock, msg)
                 elif op == "upload":
                     handle_upload(sock, msg)
                 elif op == "display":
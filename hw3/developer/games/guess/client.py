@@ -1,4 +1,4 @@
-import socket, sys, os
+import sys, os
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 while True:
@@ -10,7 +10,7 @@ while True:
     if parent_dir == current_dir:
         break
     current_dir = parent_dir
-from tools import netutils, constants
+from tools import netutils
 
 def main():
     if len(sys.argv) != 3:
@@ -20,10 +20,8 @@ def main():
     host = sys.argv[1]
     port = int(sys.argv[2])
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
     try:
-        sock.connect((host, port))
+        sock = netutils.connect(host, port)
         print(f"Connected to game server at {host}:{port}")
     except Exception as e:
         print(f"Connection failed: {e}")
@@ -1,4 +1,4 @@
-import socket, sys, threading, random, time, os
+import sys, random, os
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 while True:
@@ -10,104 +10,89 @@ while True:
     if parent_dir == current_dir:
         break
     current_dir = parent_dir
-from tools import netutils, constants
-
-# Game State
-players = []       # List of sockets
-player_threads = []
-target_number = 0
-current_turn = 0   # Index of the player whose turn it is (0, 1, or 2)
-game_over = False
-
-# Synchronization
-game_state_lock = threading.Condition() # Locks the game state and notifies threads
-
-def broadcast(message, exclude_id=None):
-    """Sends a message to all connected players."""
-    for idx, sock in enumerate(players):
-        if exclude_id is not None and idx == exclude_id:
-            continue
-        try:
-            netutils.send_msg(sock, {"type": "print", "content": message})
-        except:
-            pass
-
-def handle_player(sock, player_id):
-    global current_turn, game_over
-
-    # 1. Wait for Game Start
-    # We cheat slightly: The main thread won't start these threads until all 3 connect.
-    # So we can just send the welcome message immediately.
-    try:
-        netutils.send_msg(sock, {
-            "type": "print", 
-            "content": f"Game Started! You are Player {player_id + 1}."
+from tools import gamehost
+
+PLAYERS = 3
+
+class GuessGame(gamehost.HostedGame):
+    """
+    Players take turns guessing a number between 1 and 100.
+    The first player to guess it wins.
+    """
+    def __init__(self, room):
+        super().__init__(room)
+        self.target_number = random.randint(1, 100)
+        self.current_turn = 0   # Seat of the player whose turn it is
+        self.game_over = False
+
+    def broadcast(self, message, exclude=None):
+        """Sends a message to all connected players."""
+        self.room.broadcast({"type": "print", "content": message}, exclude=exclude)
+
+    def on_join(self, player):
+        # Send a temp message so they know they are connected
+        waiting = self.room.player_limit - len(self.room.players)
+        player.send({
+            "type": "print",
+            "content": f"Connected. Waiting for {waiting} more player(s)..."
         })
-    except:
-        return
-
-    # 2. Main Turn Loop
-    while not game_over:
-        with game_state_lock:
-            # WAIT phase: Wait until it is my turn or the game ends
-            while (current_turn != player_id) and not game_over:
-                game_state_lock.wait()
-            
-            # Check if we woke up because the game ended
-            if game_over:
-                netutils.send_msg(sock, {"type": "end", "content": "Game Over."})
-                return
-
-            # ACTION phase: It is my turn
-            try:
-                # Notify others
-                broadcast(f"Player {player_id + 1} is guessing...", exclude_id=player_id)
-
-                # Ask for input
-                netutils.send_msg(sock, {
-                    "type": "input", 
-                    "content": "Your turn! Guess (1-100): "
-                })
-                
-                # Receive input (Blocking)
-                response = netutils.recv_msg(sock)
-                if not response or 'data' not in response:
-                    guess = -1 # Treat bad data as invalid
-                else:
-                    try:
-                        guess = int(response['data'])
-                    except ValueError:
-                        guess = -1
-
-                # Logic Check
-                if guess == target_number:
-                    broadcast(f"CORRECT! Player {player_id + 1} wins with {guess}!", exclude_id=None)
-                    game_over = True
-                    game_state_lock.notify_all() # Wake up everyone to exit
-                    return
-                elif guess == -1:
-                    netutils.send_msg(sock, {"type": "print", "content": "Invalid input."})
-                elif guess < target_number:
-                    netutils.send_msg(sock, {"type": "print", "content": "Too Low!"})
-                    broadcast(f"Player {player_id + 1} guessed {guess} (Too Low).", exclude_id=player_id)
-                else:
-                    netutils.send_msg(sock, {"type": "print", "content": "Too High!"})
-                    broadcast(f"Player {player_id + 1} guessed {guess} (Too High).", exclude_id=player_id)
-
-                # End of turn: Pass baton to next player
-                if not game_over:
-                    current_turn = (current_turn + 1) % 3
-                    game_state_lock.notify_all() # Wake up all threads to check whose turn it is
-
-            except Exception as e:
-                print(f"Error in Player {player_id + 1} thread: {e}")
-                game_over = True
-                game_state_lock.notify_all()
-                return
 
-def main():
-    global target_number, players
+        if self.room.is_full():
+            print(f"All players connected. Target is {self.target_number}. Starting game...")
+            for p in self.room.players:
+                p.send({"type": "print", "content": f"Game Started! You are Player {p.seat + 1}."})
+            self.prompt()
+
+    def prompt(self):
+        """Asks the player whose turn it is for a guess."""
+        player = self.room.players[self.current_turn]
+        self.broadcast(f"Player {player.seat + 1} is guessing...", exclude=player)
+        player.send({"type": "input", "content": "Your turn! Guess (1-100): "})
+
+    def on_message(self, player, msg):
+        # Ignore anything but the answer of the current player
+        if self.game_over or not self.room.is_full() or player.seat != self.current_turn:
+            return
 
+        try:
+            guess = int(msg['data'])
+        except (KeyError, TypeError, ValueError):
+            guess = -1 # Treat bad data as invalid
+
+        # Logic Check
+        if guess == self.target_number:
+            self.broadcast(f"CORRECT! Player {player.seat + 1} wins with {guess}!")
+            self.end()
+            return
+        elif guess == -1:
+            player.send({"type": "print", "content": "Invalid input."})
+        elif guess < self.target_number:
+            player.send({"type": "print", "content": "Too Low!"})
+            self.broadcast(f"Player {player.seat + 1} guessed {guess} (Too Low).", exclude=player)
+        else:
+            player.send({"type": "print", "content": "Too High!"})
+            self.broadcast(f"Player {player.seat + 1} guessed {guess} (Too High).", exclude=player)
+
+        # End of turn: Pass baton to next player
+        self.current_turn = (self.current_turn + 1) % len(self.room.players)
+        self.prompt()
+
+    def on_leave(self, player):
+        if not self.game_over:
+            print(f"Player {player.seat + 1} left.")
+            self.broadcast(f"Player {player.seat + 1} left the game.")
+            self.end()
+
+    def end(self):
+        self.game_over = True
+        self.room.broadcast({"type": "end", "content": "Game Over."})
+        print("Game finished. Closing sockets.")
+        self.room.close()
+
+# Lets the player server run many rooms of this game in one shared process
+HOSTED_GAME = GuessGame
+
+def main():
     if len(sys.argv) != 3:
         print("Usage: python3 server.py <host> <port>")
         sys.exit(1)
@@ -115,49 +100,9 @@ def main():
     host = sys.argv[1]
     port = int(sys.argv[2])
 
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    try:
-        server_socket.bind((host, port))
-        server_socket.listen(3)
-    except Exception as e:
-        print(f"Server start failed: {e}")
-        sys.exit(1)
-
-    print(f"Threaded Server running on {host}:{port}")
-    print("Waiting for 3 players...")
-
-    # 1. Accept connections (Main Thread)
-    while len(players) < 3:
-        client_sock, addr = server_socket.accept()
-        print(f"Connection from {addr}")
-        players.append(client_sock)
-        
-        # Send a temp message so they know they are connected
-        netutils.send_msg(client_sock, {
-            "type": "print", 
-            "content": f"Connected. Waiting for {3 - len(players)} more player(s)..."
-        })
-
-    # 2. Setup Game
-    target_number = random.randint(1, 100)
-    print(f"All players connected. Target is {target_number}. Starting threads...")
-
-    # 3. Start a thread for each player
-    for i in range(3):
-        t = threading.Thread(target=handle_player, args=(players[i], i))
-        t.start()
-        player_threads.append(t)
-
-    # 4. Wait for threads to finish
-    for t in player_threads:
-        t.join()
-
-    print("Game finished. Closing sockets.")
-    for s in players:
-        s.close()
-    server_socket.close()
+    print(f"Waiting for {PLAYERS} players...")
+    # One room on its own port
+    gamehost.run_standalone(GuessGame, host, port, PLAYERS)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -10,7 +10,7 @@ while True:
     if parent_dir == current_dir:
         break
     current_dir = parent_dir
-from tools import netutils, constants
+from tools import netutils
 
 def main():
     if len(sys.argv) != 3:
@@ -20,10 +20,8 @@ def main():
     host = sys.argv[1]
     port = int(sys.argv[2])
 
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    
     try:
-        client_socket.connect((host, port))
+        client_socket = netutils.connect(host, port)
     except socket.error as e:
         print(f"Connection failed: {e}")
         sys.exit(1)
@@ -1,5 +1,4 @@
 import pygame
-import socket
 import sys
 import threading
 import os
@@ -15,7 +14,7 @@ while True:
     if parent_dir == current_dir:
         break
     current_dir = parent_dir
-from tools import netutils, constants
+from tools import netutils
 
 os.environ['SDL_AUDIODRIVER'] = 'dummy'
 
@@ -123,8 +122,7 @@ def main(host, port):
     global sock, running
 
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((host, int(port)))
+        sock = netutils.connect(host, port)
     except Exception as e:
         print(f"[!] Connection failed: {e}")
         return
@@ -26,14 +26,31 @@ def handle_connect(payload):
     
     print(f"[Client] Launching game: {game_path} -> {host}:{port}", flush=True)
     
+    # Games in the shared game host need the room token to join
+    env = dict(os.environ)
+    env.pop(netutils.ROOM_ENV, None)
+    if payload.get("room"):
+        env[netutils.ROOM_ENV] = payload["room"]
+
     try:
         # Use sys.executable to run 'python3' safely within the current environment
-        subprocess.Popen([sys.executable, game_path, host, str(port)])
+        subprocess.Popen([sys.executable, game_path, host, str(port)], env=env)
     except Exception as e:
         print(f"[Error] Failed to launch game: {e}", flush=True)
 
-def handle_save(payload):
+def handle_save(sock, payload):
     file_path = payload["path"]
+
+    # Streamed files arrive in chunks right after this message; the file is
+    # only renamed into place if it matches the hash from the game's manifest
+    if payload.get("stream"):
+        try:
+            netutils.recv_file(sock, file_path, payload.get("sha256"))
+            print(f"[Client] Saved file to: {file_path}", flush=True)
+        except (ValueError, OSError) as e:
+            print(f"[Error] Failed to save file: {e}", flush=True)
+        return
+
     file_data = payload["file data"]
     
     directory = os.path.dirname(file_path)
@@ -47,6 +64,14 @@ def handle_save(payload):
     except IOError as e:
         print(f"[Error] Failed to save file: {e}", flush=True)
 
+def handle_hashes(sock, payload):
+    """
+    Reports the SHA-256 of local files (None if missing), so the server only
+    sends the files that changed.
+    """
+    hashes = {path: netutils.file_sha256(path) for path in payload["paths"]}
+    netutils.send_msg(sock, {"hashes": hashes})
+
 def handle_upload(sock, payload):
     file_path = payload["path"]
     
@@ -56,6 +81,16 @@ def handle_upload(sock, payload):
         netutils.send_msg(sock, {"response": "error"})
         return
 
+    # Streamed upload: announce the file, then send it in chunks
+    if payload.get("stream"):
+        try:
+            netutils.send_msg(sock, {"response": "success", "size": os.path.getsize(file_path)})
+            print(f"[Upload] Streaming file: {file_path}", flush=True)
+            netutils.send_file(sock, file_path)
+        except OSError as e:
+            print(f"[Error] Failed to stream file: {e}", flush=True)
+        return
+
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
@@ -121,6 +156,7 @@ def main():
     
     try:
         sock.connect((constants.PLAY_HOST, constants.PLAY_PORT))
+        netutils.negotiate(sock)
         print(f"[Client] Connected to {constants.PLAY_HOST}:{constants.PLAY_PORT}", flush=True)
     except ConnectionRefusedError:
         print("[Client] Server not available.", flush=True)
@@ -141,7 +177,9 @@ def main():
                 if op == "connect":
                     handle_connect(msg)
                 elif op == "save":
-                    handle_save(msg)
+                    handle_save(sock, msg)
+                elif op == "hashes":
+                    handle_hashes(sock, msg)
                 elif op == "upload":
                     handle_upload(sock, msg)
                 elif op == "display":
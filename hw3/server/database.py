@@ -1,7 +1,9 @@
 import sqlite3
 import threading
-import socket
+import asyncio
+import concurrent.futures
 import json
+import secrets
 import sys
 import os
 
@@ -14,10 +16,59 @@ from tools.constants import *
 # Configuration
 DB_PATH = 'game_store.db'
 
-def get_db_connection():
-    """Establishes a database connection."""
-    conn = sqlite3.connect(DB_PATH)
+# Ops that never write; these run on the read-only connection pool.
+# Everything else is serialized through the single writer connection.
+READ_OPS = {'query player', 'query dev', 'query room', 'query game', 'query feedback', 'explain'}
+
+# Query ops -> the table they select from
+QUERY_TABLES = {
+    'query player': 'Players',
+    'query dev': 'Devs',
+    'query room': 'Rooms',
+    'query game': 'Games',
+}
+
+# Columns a query may filter, project or sort on (nothing else reaches the SQL)
+QUERY_COLUMNS = {
+    'Players': ('name', 'password', 'status'),
+    'Devs': ('name', 'password', 'status'),
+    'Rooms': ('name', 'game', 'host', 'status', 'port', 'player_limit'),
+    'Games': ('name', 'dev', 'version', 'status', 'type', 'players', 'description',
+              'rating_sum', 'rating_count', 'recent_feedback'),
+}
+
+# Columns stored as JSON text, decoded before they are returned
+JSON_COLUMNS = {
+    'Games': ('recent_feedback',),
+}
+
+# The list each row carries, loaded from its child table
+LIST_FIELDS = {
+    'Players': 'games',
+    'Devs': 'games',
+    'Rooms': 'guests',
+    'Games': 'feedback',
+}
+
+# Parent table -> (child table, owner column) for the owned game libraries
+CHILD_GAME_TABLES = {
+    'Players': ('PlayerGames', 'player'),
+    'Devs': ('DevGames', 'dev'),
+}
+
+# Pragmas that persist in the database file, so read-only connections skip them
+PERSISTENT_PRAGMAS = {'journal_mode'}
+
+def get_db_connection(readonly=False):
+    """Establishes a database connection, tuned with DB_PRAGMAS."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row 
+    for pragma, value in DB_PRAGMAS.items():
+        if not (readonly and pragma in PERSISTENT_PRAGMAS):
+            conn.execute(f"PRAGMA {pragma} = {value}")
     return conn
 
 def init_db():
@@ -32,7 +83,6 @@ def init_db():
         CREATE TABLE IF NOT EXISTS Players (
             name TEXT PRIMARY KEY,
             password TEXT,
-            games TEXT DEFAULT '[]',
             status TEXT DEFAULT 'offline'
         )
     ''')
@@ -43,7 +93,6 @@ def init_db():
         CREATE TABLE IF NOT EXISTS Devs (
             name TEXT PRIMARY KEY,
             password TEXT,
-            games TEXT DEFAULT '[]',
             status TEXT DEFAULT 'offline'
         )
     ''')
@@ -54,7 +103,6 @@ def init_db():
             name TEXT PRIMARY KEY,
             game TEXT,
             host TEXT,
-            guests TEXT DEFAULT '[]',
 			status TEXT DEFAULT 'inactive',
             port INTEGER DEFAULT 0,
             player_limit INTEGER
@@ -71,20 +119,261 @@ def init_db():
             type TEXT,
             players INTEGER,
             description TEXT,
-            feedback TEXT DEFAULT '[]'
+            rating_sum INTEGER DEFAULT 0,
+            rating_count INTEGER DEFAULT 0,
+            recent_feedback TEXT DEFAULT '[]'
         )
     ''')
 
+    # Child Tables: one row per list element, in insertion (rowid) order
+    # Table: PlayerGames / DevGames (owned game libraries)
+    for table_name, owner in CHILD_GAME_TABLES.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                {owner} TEXT,
+                game TEXT,
+                version INTEGER,
+                PRIMARY KEY ({owner}, game)
+            )
+        ''')
+
+    # Table: RoomGuests
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS RoomGuests (
+            room TEXT,
+            guest TEXT,
+            PRIMARY KEY (room, guest)
+        )
+    ''')
+
+    # Table: GameFeedback
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS GameFeedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game TEXT,
+            player TEXT,
+            stars INTEGER,
+            comment TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_game ON GameFeedback (game, id)")
+
+    # Secondary indexes for the hot query criteria: lobby listings
+    # (Rooms by game), "my games" screens (Games by dev) and the store (Games by status)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rooms_game_status ON Rooms (game, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_dev ON Games (dev)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_status ON Games (status)")
+
     conn.commit()
+    migrate_db(conn)
     conn.close()
     print(f"[*] Database initialized at {DB_PATH}")
 
+def migrate_db(conn):
+    """
+    One-shot migrations for databases created by older versions:
+    - Moves the JSON list columns (Players.games, Devs.games, Rooms.guests,
+      Games.feedback) into their child tables and drops the old columns.
+    - Adds the rating aggregate columns of Games and fills them in from
+      GameFeedback.
+    Does nothing once the database is up to date.
+    """
+    cursor = conn.cursor()
+
+    def has_column(table_name, column):
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        return any(row['name'] == column for row in cursor.fetchall())
+
+    migrations = []
+    for parent, (child, owner) in CHILD_GAME_TABLES.items():
+        migrations.append((parent, 'games',
+            f"INSERT OR IGNORE INTO {child} ({owner}, game, version) VALUES (?, ?, ?)",
+            lambda name, item: (name, item[0], item[1])))
+    migrations.append(('Rooms', 'guests',
+        "INSERT OR IGNORE INTO RoomGuests (room, guest) VALUES (?, ?)",
+        lambda name, item: (name, item)))
+    migrations.append(('Games', 'feedback',
+        "INSERT INTO GameFeedback (game, player, stars, comment) VALUES (?, ?, ?, ?)",
+        lambda name, item: (name, item[0], item[1], item[2])))
+
+    for table_name, column, insert_sql, to_params in migrations:
+        if not has_column(table_name, column):
+            continue
+
+        cursor.execute(f"SELECT name, {column} FROM {table_name}")
+        rows = cursor.fetchall()
+        for row in rows:
+            for item in json.loads(row[column] or '[]'):
+                cursor.execute(insert_sql, to_params(row['name'], item))
+
+        cursor.execute(f"ALTER TABLE {table_name} DROP COLUMN {column}")
+        conn.commit()
+        print(f"[*] Migrated {table_name}.{column} ({len(rows)} rows)")
+
+    rating_columns = [
+        ('rating_sum', 'INTEGER DEFAULT 0'),
+        ('rating_count', 'INTEGER DEFAULT 0'),
+        ('recent_feedback', "TEXT DEFAULT '[]'"),
+    ]
+    missing = [(c, decl) for c, decl in rating_columns if not has_column('Games', c)]
+    if missing:
+        for column, decl in missing:
+            cursor.execute(f"ALTER TABLE Games ADD COLUMN {column} {decl}")
+        cursor.execute("""
+            UPDATE Games SET
+                rating_sum = (SELECT COALESCE(SUM(stars), 0) FROM GameFeedback WHERE game = Games.name),
+                rating_count = (SELECT COUNT(*) FROM GameFeedback WHERE game = Games.name)
+        """)
+        cursor.execute("SELECT name FROM Games")
+        for row in cursor.fetchall():
+            recent = load_feedback_page(cursor, row['name'], RECENT_FEEDBACK, 0)
+            cursor.execute(
+                "UPDATE Games SET recent_feedback = ? WHERE name = ?",
+                (json.dumps(recent), row['name'])
+            )
+        conn.commit()
+        print("[*] Migrated Games rating aggregates")
+
 def row_to_dict(row):
     return dict(row) if row else None
 
-def process_request(conn, request):
+def load_games(cursor, table_name, name):
+    """Returns a user's library as [[game_name, version], ...]."""
+    child, owner = CHILD_GAME_TABLES[table_name]
+    cursor.execute(f"SELECT game, version FROM {child} WHERE {owner} = ? ORDER BY rowid", (name,))
+    return [[row['game'], row['version']] for row in cursor.fetchall()]
+
+def load_guests(cursor, room_name):
+    """Returns a room's guest names in join order."""
+    cursor.execute("SELECT guest FROM RoomGuests WHERE room = ? ORDER BY rowid", (room_name,))
+    return [row['guest'] for row in cursor.fetchall()]
+
+def load_feedback(cursor, game_name):
+    """Returns a game's feedback as [[player, stars, comment], ...]."""
+    cursor.execute(
+        "SELECT player, stars, comment FROM GameFeedback WHERE game = ? ORDER BY id",
+        (game_name,)
+    )
+    return [[row['player'], row['stars'], row['comment']] for row in cursor.fetchall()]
+
+def load_feedback_page(cursor, game_name, limit, offset):
+    """Returns one page of a game's feedback, newest first, as [[player, stars, comment], ...]."""
+    cursor.execute(
+        "SELECT player, stars, comment FROM GameFeedback WHERE game = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+        (game_name, limit, offset)
+    )
+    return [[row['player'], row['stars'], row['comment']] for row in cursor.fetchall()]
+
+def check_paging(limit, offset):
+    """Raises ValueError unless limit and offset are None or non-negative integers."""
+    for key, value in (('limit', limit), ('offset', offset)):
+        if value is not None and (type(value) is not int or value < 0):
+            raise ValueError(f"{key} must be a non-negative integer")
+
+def load_list_field(cursor, table_name, name):
+    """Returns the LIST_FIELDS entry of one row."""
+    if table_name in CHILD_GAME_TABLES:
+        return load_games(cursor, table_name, name)
+    if table_name == 'Rooms':
+        return load_guests(cursor, name)
+    return load_feedback(cursor, name)
+
+def build_query(request):
+    """
+    Returns (sql, params, list_field) for a query op's SELECT on its table.
+    Optional request keys, all checked against QUERY_COLUMNS:
+        fields      columns to return (default: all); `name` is always included,
+                    and the row's list (games/guests/feedback) only if named here
+        order_by    column to sort on, "-column" for descending
+        limit       max rows to return
+        offset      rows to skip (pages are in insertion order unless order_by is given)
+    `list_field` is the list to attach to every row, or None.
+    Raises ValueError for unknown columns or bad paging values.
+    """
+    table_name = QUERY_TABLES[request['op']]
+    columns = QUERY_COLUMNS[table_name]
+    list_field = LIST_FIELDS[table_name]
+
+    fields = request.get('fields')
+    if fields is None:
+        select = "*"
+    else:
+        unknown = [f for f in fields if f not in columns and f != list_field]
+        if unknown:
+            raise ValueError(f"Unknown fields for {table_name}: {unknown}")
+        select = ", ".join(['name'] + [f for f in fields if f in columns and f != 'name'])
+        if list_field not in fields:
+            list_field = None
+    query = f"SELECT {select} FROM {table_name}"
+
+    criteria = request.get('criteria', {})
+    params = []
+    if criteria:
+        unknown = [k for k in criteria if k not in columns]
+        if unknown:
+            raise ValueError(f"Unknown criteria for {table_name}: {unknown}")
+        conditions = [f"{k} = ?" for k in criteria.keys()]
+        query += " WHERE " + " AND ".join(conditions)
+        params = list(criteria.values())
+
+    order_by = request.get('order_by')
+    limit = request.get('limit')
+    offset = request.get('offset')
+    check_paging(limit, offset)
+
+    if order_by is not None:
+        column = order_by[1:] if str(order_by).startswith('-') else order_by
+        if column not in columns:
+            raise ValueError(f"Cannot order {table_name} by {order_by!r}")
+        query += f" ORDER BY {column}" + (" DESC" if column != order_by else "")
+    elif limit is not None or offset is not None:
+        query += " ORDER BY rowid"  # Stable pages
+
+    if limit is not None or offset is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset or 0]
+    return query, params, list_field
+
+def run_query(cursor, request):
+    """Runs a query op and returns its response."""
+    query, params, list_field = build_query(request)
+    table_name = QUERY_TABLES[request['op']]
+    cursor.execute(query, params)
+    rows = []
+    for row in cursor.fetchall():
+        item = row_to_dict(row)
+        for column in JSON_COLUMNS.get(table_name, ()):
+            if column in item:
+                item[column] = json.loads(item[column] or '[]')
+        if list_field:
+            item[list_field] = load_list_field(cursor, table_name, item['name'])
+        rows.append(item)
+    return {"status": "success", "data": rows}
+
+def update_status(cursor, table_name, request):
+    """
+    Sets a player's or developer's status. With `expect` (e.g.
+    {"password": pw, "status": "offline"}) the row must also match those
+    columns, so a login can check and claim the account in one statement.
+    """
+    expect = request.get('expect', {})
+    unknown = [k for k in expect if k not in QUERY_COLUMNS[table_name]]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table_name}: {unknown}")
+
+    conditions = ["name = ?"] + [f"{k} = ?" for k in expect]
+    cursor.execute(
+        f"UPDATE {table_name} SET status = ? WHERE " + " AND ".join(conditions),
+        [request['status'], request['name']] + list(expect.values())
+    )
+    if expect and cursor.rowcount == 0:
+        return {"status": "error", "message": "No matching account"}
+    return {"status": "success"}
+
+def execute_request(conn, request):
     """
     Dispatches the request to the appropriate handler logic.
+    Changes are left uncommitted; process_request() commits or rolls back.
     """
     op = request.get('op')
     cursor = conn.cursor()
@@ -94,34 +383,32 @@ def process_request(conn, request):
         # Helper function to handle 'update games' logic to avoid code duplication
         # This works for both tables since they are identical
         def handle_update_games(table_name, name, action, payload):
-            cursor.execute(f"SELECT games FROM {table_name} WHERE name = ?", (name,))
-            row = cursor.fetchone()
-            if row:
-                games_list = json.loads(row['games'])
-                
+            cursor.execute(f"SELECT 1 FROM {table_name} WHERE name = ?", (name,))
+            if cursor.fetchone():
+                child, owner = CHILD_GAME_TABLES[table_name]
+
                 if action == 'add game':
                     # payload: [game_name, version]
-                    if not any(g[0] == payload[0] for g in games_list):
-                        games_list.append(payload)
+                    cursor.execute(
+                        f"INSERT OR IGNORE INTO {child} ({owner}, game, version) VALUES (?, ?, ?)",
+                        (name, payload[0], payload[1])
+                    )
                 
                 elif action == 'update version':
                     # payload: [game_name, new_version]
                     target_game, new_ver = payload
-                    for i, (g_name, g_ver) in enumerate(games_list):
-                        if g_name == target_game:
-                            games_list[i] = [g_name, new_ver]
-                            break
+                    cursor.execute(
+                        f"UPDATE {child} SET version = ? WHERE {owner} = ? AND game = ?",
+                        (new_ver, name, target_game)
+                    )
                             
                 elif action == 'remove game':
                     # payload: game_name
-                    target_game = payload
-                    games_list = [g for g in games_list if g[0] != target_game]
+                    cursor.execute(
+                        f"DELETE FROM {child} WHERE {owner} = ? AND game = ?",
+                        (name, payload)
+                    )
 
-                cursor.execute(
-                    f"UPDATE {table_name} SET games = ? WHERE name = ?",
-                    (json.dumps(games_list), name)
-                )
-                conn.commit()
                 return {"status": "success"}
             else:
                 return {"status": "error", "message": f"User not found in {table_name}"}
@@ -134,33 +421,13 @@ def process_request(conn, request):
                 "INSERT INTO Players (name, password) VALUES (?, ?)",
                 (request['name'], request['password'])
             )
-            conn.commit()
             response = {"status": "success"}
 
         elif op == 'query player':
-            criteria = request.get('criteria', {})
-            query = "SELECT * FROM Players"
-            params = []
-            if criteria:
-                conditions = [f"{k} = ?" for k in criteria.keys()]
-                query += " WHERE " + " AND ".join(conditions)
-                params = list(criteria.values())
-            
-            cursor.execute(query, params)
-            users = []
-            for row in cursor.fetchall():
-                u = row_to_dict(row)
-                u['games'] = json.loads(u['games'])
-                users.append(u)
-            response = {"status": "success", "data": users}
+            response = run_query(cursor, request)
 
         elif op == 'update player status':
-            cursor.execute(
-                "UPDATE Players SET status = ? WHERE name = ?",
-                (request['status'], request['name'])
-            )
-            conn.commit()
-            response = {"status": "success"}
+            response = update_status(cursor, 'Players', request)
 
         elif op == 'update player games':
             response = handle_update_games('Players', request['name'], request['action'], request['payload'])
@@ -173,33 +440,13 @@ def process_request(conn, request):
                 "INSERT INTO Devs (name, password) VALUES (?, ?)",
                 (request['name'], request['password'])
             )
-            conn.commit()
             response = {"status": "success"}
 
         elif op == 'query dev':
-            criteria = request.get('criteria', {})
-            query = "SELECT * FROM Devs"
-            params = []
-            if criteria:
-                conditions = [f"{k} = ?" for k in criteria.keys()]
-                query += " WHERE " + " AND ".join(conditions)
-                params = list(criteria.values())
-            
-            cursor.execute(query, params)
-            users = []
-            for row in cursor.fetchall():
-                u = row_to_dict(row)
-                u['games'] = json.loads(u['games'])
-                users.append(u)
-            response = {"status": "success", "data": users}
+            response = run_query(cursor, request)
 
         elif op == 'update dev status':
-            cursor.execute(
-                "UPDATE Devs SET status = ? WHERE name = ?",
-                (request['status'], request['name'])
-            )
-            conn.commit()
-            response = {"status": "success"}
+            response = update_status(cursor, 'Devs', request)
 
         elif op == 'update dev games':
             response = handle_update_games('Devs', request['name'], request['action'], request['payload'])
@@ -212,7 +459,6 @@ def process_request(conn, request):
                 "INSERT INTO Rooms (name, game, host, player_limit) VALUES (?, ?, ?, ?)",
                 (request['name'], request['game'], request['host'], request['player_limit'])
             )
-            conn.commit()
             response = {"status": "success"}
         
         elif op == 'update room status':
@@ -220,7 +466,6 @@ def process_request(conn, request):
                 "UPDATE Rooms SET status = ? WHERE name = ?",
                 (request['status'], request['name'])
             )
-            conn.commit()
             
             # Check if a row was actually modified (optional but good for debugging)
             if cursor.rowcount > 0:
@@ -233,7 +478,6 @@ def process_request(conn, request):
                 "UPDATE Rooms SET port = ? WHERE name = ?",
                 (request['port'], request['name'])
             )
-            conn.commit()
             
             # Check if the room actually existed
             if cursor.rowcount > 0:
@@ -242,49 +486,64 @@ def process_request(conn, request):
                 response = {"status": "error", "message": "Room not found"}
 
         elif op == 'query room':
-            criteria = request.get('criteria', {})
-            query = "SELECT * FROM Rooms"
-            params = []
-            if criteria:
-                conditions = [f"{k} = ?" for k in criteria.keys()]
-                query += " WHERE " + " AND ".join(conditions)
-                params = list(criteria.values())
-                
-            cursor.execute(query, params)
-            rooms = []
-            for row in cursor.fetchall():
-                r = row_to_dict(row)
-                r['guests'] = json.loads(r['guests'])
-                rooms.append(r)
-            response = {"status": "success", "data": rooms}
+            response = run_query(cursor, request)
 
         elif op == 'update room guests':
-            cursor.execute("SELECT guests FROM Rooms WHERE name = ?", (request['name'],))
-            row = cursor.fetchone()
-            if row:
-                guests_list = json.loads(row['guests'])
+            cursor.execute("SELECT 1 FROM Rooms WHERE name = ?", (request['name'],))
+            if cursor.fetchone():
                 action = request['action']
                 guest = request['guest_name']
 
                 if action == 'add guest':
-                    if guest not in guests_list:
-                        guests_list.append(guest)
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO RoomGuests (room, guest) VALUES (?, ?)",
+                        (request['name'], guest)
+                    )
                 elif action == 'remove guest':
-                    if guest in guests_list:
-                        guests_list.remove(guest)
+                    cursor.execute(
+                        "DELETE FROM RoomGuests WHERE room = ? AND guest = ?",
+                        (request['name'], guest)
+                    )
 
-                cursor.execute(
-                    "UPDATE Rooms SET guests = ? WHERE name = ?",
-                    (json.dumps(guests_list), request['name'])
-                )
-                conn.commit()
                 response = {"status": "success"}
             else:
                 response = {"status": "error", "message": "Room not found"}
 
+        elif op == 'join room':
+            # Capacity, status and duplicate checks and the insert all happen
+            # in one IMMEDIATE transaction, so racing joiners cannot overfill a room
+            room_name = request['name']
+            guest = request['guest_name']
+
+            if not conn.in_transaction:  # A batch has already begun one
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT * FROM Rooms WHERE name = ?", (room_name,))
+            row = cursor.fetchone()
+            guests = load_guests(cursor, room_name) if row else []
+
+            if not row:
+                response = {"status": "error", "message": "Room not found"}
+            elif row['status'] != 'inactive':
+                response = {"status": "error", "message": "Game already in progress"}
+            elif guest == row['host']:
+                response = {"status": "error", "message": "You are the host of this room"}
+            elif guest not in guests and 1 + len(guests) >= row['player_limit']:
+                response = {"status": "error", "message": "Room is full"}
+            else:
+                # Re-joining is a no-op, so a guest is never listed twice
+                if guest not in guests:
+                    cursor.execute(
+                        "INSERT INTO RoomGuests (room, guest) VALUES (?, ?)",
+                        (room_name, guest)
+                    )
+                    guests.append(guest)
+                r = row_to_dict(row)
+                r['guests'] = guests
+                response = {"status": "success", "data": r}
+
         elif op == 'remove room':
+            cursor.execute("DELETE FROM RoomGuests WHERE room = ?", (request['name'],))
             cursor.execute("DELETE FROM Rooms WHERE name = ?", (request['name'],))
-            conn.commit()
             response = {"status": "success"}
 
         # ---------------------------------------------------------------------
@@ -292,103 +551,305 @@ def process_request(conn, request):
         # ---------------------------------------------------------------------
         elif op == 'create game':
             cursor.execute(
-                "INSERT INTO Games (name, dev, type, players, description) VALUES (?, ?, ?, ?, ?)",
-                (request['name'], request['dev'], request['type'], request['players'], request['description'])
+                "INSERT INTO Games (name, dev, type, players, description, version) VALUES (?, ?, ?, ?, ?, ?)",
+                (request['name'], request['dev'], request['type'], request['players'], request['description'],
+                 request.get('version', 1))
             )
-            conn.commit()
             response = {"status": "success"}
 
         elif op == 'query game':
-            criteria = request.get('criteria', {})
-            query = "SELECT * FROM Games"
-            params = []
-            if criteria:
-                conditions = [f"{k} = ?" for k in criteria.keys()]
-                query += " WHERE " + " AND ".join(conditions)
-                params = list(criteria.values())
-
-            cursor.execute(query, params)
-            games = []
-            for row in cursor.fetchall():
-                g = row_to_dict(row)
-                g['feedback'] = json.loads(g['feedback'])
-                games.append(g)
-            response = {"status": "success", "data": games}
+            response = run_query(cursor, request)
 
         elif op == 'update game':
             updates = request.get('updates', {})
+            # Optional guard like update_status(): e.g. {"version": 2} only
+            # updates the game if nobody moved it past version 2 meanwhile
+            expect = request.get('expect', {})
+            unknown = [k for k in expect if k not in QUERY_COLUMNS['Games']]
+            if unknown:
+                raise ValueError(f"Unknown columns for Games: {unknown}")
             if updates:
                 set_clause = [f"{k} = ?" for k in updates.keys()]
                 params = list(updates.values())
                 params.append(request['name'])
+                params.extend(expect.values())
                 
-                sql = f"UPDATE Games SET {', '.join(set_clause)} WHERE name = ?"
+                conditions = ["name = ?"] + [f"{k} = ?" for k in expect]
+                sql = f"UPDATE Games SET {', '.join(set_clause)} WHERE {' AND '.join(conditions)}"
                 cursor.execute(sql, params)
-                conn.commit()
-                response = {"status": "success"}
+                if expect and cursor.rowcount == 0:
+                    response = {"status": "error", "message": "Game was changed by another update"}
+                else:
+                    response = {"status": "success"}
 
         elif op == 'add feedback':
-            cursor.execute("SELECT feedback FROM Games WHERE name = ?", (request['name'],))
+            cursor.execute("SELECT recent_feedback FROM Games WHERE name = ?", (request['name'],))
             row = cursor.fetchone()
 
             if row:
-                fb_list = json.loads(row['feedback'])
-                fb_list.append(request['feedback'])
-                
+                player, stars, comment = request['feedback']
+                if type(stars) is not int or not 1 <= stars <= 5:
+                    raise ValueError("stars must be an integer from 1 to 5")
+                cursor.execute(
+                    "INSERT INTO GameFeedback (game, player, stars, comment) VALUES (?, ?, ?, ?)",
+                    (request['name'], player, stars, comment)
+                )
+                # Keep the aggregates and the recent reviews in step, so reading
+                # a game's rating never touches the full history
+                recent = [[player, stars, comment]] + json.loads(row['recent_feedback'] or '[]')
                 cursor.execute(
-                    "UPDATE Games SET feedback = ? WHERE name = ?",
-                    (json.dumps(fb_list), request['name'])
+                    "UPDATE Games SET rating_sum = rating_sum + ?, rating_count = rating_count + 1, "
+                    "recent_feedback = ? WHERE name = ?",
+                    (stars, json.dumps(recent[:RECENT_FEEDBACK]), request['name'])
                 )
-                conn.commit()
                 response = {"status": "success"}
             else:
                 response = {"status": "error", "message": "Game not found"}
 
+        elif op == 'query feedback':
+            # A game's full review history, newest first, one page at a time
+            limit = request.get('limit', 20)
+            offset = request.get('offset', 0)
+            check_paging(limit, offset)
+            page = load_feedback_page(cursor, request['name'], -1 if limit is None else limit, offset or 0)
+            response = {"status": "success", "data": page}
+
+        # ---------------------------------------------------------------------
+        # 5. Diagnostics
+        # ---------------------------------------------------------------------
+        elif op == 'explain':
+            # EXPLAIN QUERY PLAN of the SELECT a query op would run, e.g.
+            # {"op": "explain", "request": {"op": "query room", "criteria": {"game": "x"}}}
+            target = request.get('request', {})
+            if target.get('op') not in QUERY_TABLES:
+                response = {"status": "error", "message": "Only query ops can be explained"}
+            else:
+                query, params, _ = build_query(target)
+                cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+                plan = [row['detail'] for row in cursor.fetchall()]
+                response = {"status": "success", "sql": query, "data": plan}
+
     except sqlite3.Error as e:
         response = {"status": "error", "message": f"Database error: {str(e)}"}
+    except ValueError as e:
+        response = {"status": "error", "message": str(e)}
     except Exception as e:
         response = {"status": "error", "message": f"Server error: {str(e)}"}
 
     return response
 
-def client_handler(sock):
+def process_request(conn, request):
     """
-    Thread target. Handles the connection lifecycle for a single client.
+    Runs one request, or a batch, in its own transaction: committed if it
+    succeeded, rolled back otherwise.
     """
-    conn = get_db_connection()
+    if request.get('op') == 'batch':
+        return process_batch(conn, request)
+
+    response = execute_request(conn, request)
+    try:
+        if response.get('status') == 'success':
+            conn.commit()
+        else:
+            conn.rollback()
+    except sqlite3.Error as e:
+        conn.rollback()
+        response = {"status": "error", "message": f"Database error: {str(e)}"}
+    return response
+
+def process_batch(conn, request):
+    """
+    Runs a list of requests in a single transaction (one commit):
+        {"op": "batch", "requests": [request, ...], "atomic": true}
+    -> {"status": ..., "results": [response, ...]}, one result per request.
+    Each request runs inside a savepoint, so a failed one leaves no partial
+    changes. With atomic (the default) the first failure rolls back the
+    whole batch and the remaining requests are skipped; otherwise every
+    request that succeeded is committed and the batch itself succeeds.
+    """
+    requests = request.get('requests')
+    atomic = request.get('atomic', True)
+    if not isinstance(requests, list) or not all(isinstance(r, dict) for r in requests):
+        return {"status": "error", "message": "batch needs a list of requests"}
+    if any(r.get('op') == 'batch' for r in requests):
+        return {"status": "error", "message": "Batches cannot be nested"}
+
+    cursor = conn.cursor()
+    results = []
+    failed = False
     try:
+        cursor.execute("BEGIN" if is_read_only(request) else "BEGIN IMMEDIATE")
+        for item in requests:
+            if failed and atomic:
+                results.append({"status": "error", "message": "Skipped: an earlier request failed"})
+                continue
+
+            cursor.execute("SAVEPOINT batch_item")
+            result = execute_request(conn, item)
+            if result.get('status') != 'success':
+                cursor.execute("ROLLBACK TO batch_item")
+                failed = True
+            cursor.execute("RELEASE batch_item")
+            results.append(result)
+
+        if failed and atomic:
+            conn.rollback()
+        else:
+            conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"status": "error", "message": f"Database error: {str(e)}"}
+
+    status = "error" if failed and atomic else "success"
+    return {"status": status, "results": results}
+
+def is_read_only(request):
+    """True if a request (or every request of a batch) can run on a read-only connection."""
+    if request.get('op') == 'batch':
+        return all(isinstance(r, dict) and r.get('op') in READ_OPS for r in request.get('requests') or [])
+    return request.get('op') in READ_OPS
+
+# -----------------------------------------------------------------------------
+# asyncio Front End
+# -----------------------------------------------------------------------------
+
+# Each executor thread owns exactly one sqlite connection
+_thread_state = threading.local()
+
+def open_thread_connection(readonly):
+    """Executor initializer. Opens this worker thread's connection."""
+    _thread_state.conn = get_db_connection(readonly)
+
+def run_request(request):
+    """Executor target. Runs one request on this worker thread's connection."""
+    return process_request(_thread_state.conn, request)
+
+def warm_up_pool(pool, workers):
+    """
+    Opens the connections of an executor up front instead of on its first
+    requests. Each worker keeps its connection for the life of the server.
+    """
+    barrier = threading.Barrier(workers)
+    futures = [pool.submit(barrier.wait) for _ in range(workers)]
+    concurrent.futures.wait(futures)
+
+# -----------------------------------------------------------------------------
+# Catalog Version
+# -----------------------------------------------------------------------------
+# Bumped whenever a game is created or updated, so front-end servers can cache
+# the catalog and only reload it when it changed. Clients long-poll with
+#   {"op": "watch catalog", "version": last seen or None, "timeout": seconds}
+# which answers {"status": "success", "version": current} as soon as the
+# version differs from the one sent, or once the timeout expires.
+
+# Ops that change the catalog when they succeed
+CATALOG_OPS = {'create game', 'update game'}
+
+# Longest a watch request is held open, in seconds
+CATALOG_WATCH_TIMEOUT = 30
+
+def changes_catalog(request, response):
+    """True if a request (or any committed part of a batch) changed the catalog."""
+    if request.get('op') == 'batch':
+        if response.get('status') != 'success':
+            return False
+        return any(r.get('op') in CATALOG_OPS and result.get('status') == 'success'
+                   for r, result in zip(request['requests'], response['results']))
+    return request.get('op') in CATALOG_OPS and response.get('status') == 'success'
+
+class CatalogVersion:
+    """
+    The current catalog version. Lives on the event loop; versions carry a
+    random epoch, so those handed out before a restart never match.
+    """
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self.counter = 0
+        self._changed = asyncio.Event()
+
+    def current(self):
+        return f"{self.epoch}.{self.counter}"
+
+    def bump(self):
+        """Moves to a new version and wakes every watcher."""
+        self.counter += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def watch(self, request):
+        """Handles a watch catalog request."""
+        try:
+            timeout = min(float(request.get('timeout', CATALOG_WATCH_TIMEOUT)), CATALOG_WATCH_TIMEOUT)
+        except (TypeError, ValueError):
+            timeout = CATALOG_WATCH_TIMEOUT
+        if request.get('version') == self.current():
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return {"status": "success", "version": self.current()}
+
+async def client_handler(reader, writer, read_pool, write_pool, catalog):
+    """
+    Coroutine per client. Handles the connection lifecycle for a single client.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        # A client that skips the codec hello sends its first request right away
+        pending = await netutils.async_accept_negotiation(reader, writer)
         while True:
-            request = netutils.recv_msg(sock)
+            request = pending or await netutils.async_recv_msg(reader)
+            pending = None
             if not request:
                 break
-            response = process_request(conn, request)
-            netutils.send_msg(sock, response)
+            op = request.get('op')
+            if op == 'watch catalog':
+                response = await catalog.watch(request)
+            else:
+                pool = read_pool if is_read_only(request) else write_pool
+                response = await loop.run_in_executor(pool, run_request, request)
+                if changes_catalog(request, response):
+                    catalog.bump()
+            await netutils.async_send_msg(writer, response)
     except Exception as e:
         print(f"[!] Error handling client: {e}")
     finally:
-        conn.close()
-        sock.close()
+        writer.close()
 
-def start_server():
+async def serve():
     init_db()
-    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
+
+    read_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=DB_READERS, thread_name_prefix="db-reader",
+        initializer=open_thread_connection, initargs=(True,)
+    )
+    write_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="db-writer",
+        initializer=open_thread_connection, initargs=(False,)
+    )
+    # The writer first: read-only connections need its WAL index to exist
+    warm_up_pool(write_pool, 1)
+    warm_up_pool(read_pool, DB_READERS)
+    catalog = CatalogVersion()
+
     try:
-        server_sock.bind((DB_HOST, DB_PORT))
-        server_sock.listen(5)
+        server = await asyncio.start_server(
+            lambda r, w: client_handler(r, w, read_pool, write_pool, catalog),
+            DB_HOST, DB_PORT, backlog=DB_BACKLOG
+        )
         print(f"[*] Database Server listening on {DB_HOST}:{DB_PORT}")
-        
-        while True:
-            client_sock, addr = server_sock.accept()
-            t = threading.Thread(target=client_handler, args=(client_sock,))
-            t.daemon = True 
-            t.start()
-            
+        async with server:
+            await server.serve_forever()
+    finally:
+        read_pool.shutdown(wait=False)
+        write_pool.shutdown(wait=False)
+
+def start_server():
+    try:
+        asyncio.run(serve())
     except KeyboardInterrupt:
         print("\n[*] Stopping server...")
-    finally:
-        server_sock.close()
 
 if __name__ == "__main__":
     start_server()
\ No newline at end of file
@@ -1,7 +1,8 @@
-import socket
-import threading
+import asyncio
 import sys
 import os
+import shutil
+import tempfile
 
 # -----------------------------------------------------------------------------
 # Path Setup
@@ -10,7 +11,7 @@ import os
 sys.path.append('..')
 
 try:
-    from tools import constants, netutils
+    from tools import constants, netutils, dbpool, artifacts
 except ImportError as e:
     print(f"Error importing tools: {e}")
     print("Ensure you are running this from the 'server/' directory or 'netprog_project/' root.")
@@ -20,22 +21,34 @@ except ImportError as e:
 # Helper Functions
 # -----------------------------------------------------------------------------
 
-def send_db_request(request_dict):
+# Long-lived connections to the DB Server, shared by all client sessions
+db_pool = dbpool.AsyncDBPool(constants.DB_HOST, constants.DB_PORT, size=constants.DB_POOL_SIZE)
+
+async def send_db_request(request_dict):
     """
-    Connects to the DB Server, sends a request, receives a response,
-    and closes the connection.
+    Sends a request to the DB Server over a pooled connection
+    and returns the response.
     """
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as db_sock:
-            db_sock.connect((constants.DB_HOST, constants.DB_PORT))
-            netutils.send_msg(db_sock, request_dict)
-            response = netutils.recv_msg(db_sock)
-            return response
+        return await db_pool.request(request_dict)
     except Exception as e:
         print(f"[Server Error] DB Communication failed: {e}")
         return {}
 
-def client_interaction(sock, text, input_type):
+class DevConnection:
+    """The asyncio streams of one developer client."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, message):
+        await netutils.async_send_msg(self.writer, message)
+
+    async def recv(self):
+        return await netutils.async_recv_msg(self.reader)
+
+async def client_interaction(conn, text, input_type):
     """
     Helper to standardize the 'display' operation protocol.
     1. Sends display instruction to client.
@@ -46,60 +59,141 @@ def client_interaction(sock, text, input_type):
         "text": text,
         "input": input_type
     }
-    netutils.send_msg(sock, msg)
+    await conn.send(msg)
     if input_type == "none":
         return None
-    return netutils.recv_msg(sock)
+    return await conn.recv()
+
+# Immutable, versioned copies of every uploaded game
+store = artifacts.ArtifactStore()
+
+# Columns of the Read Game screen: rating aggregates and recent reviews, not the full history
+GAME_INFO_FIELDS = ["name", "dev", "version", "status", "type", "players", "description",
+                    "rating_sum", "rating_count", "recent_feedback"]
+
+# Every uploaded game must provide these files
+REQUIRED_FILES = ["server.py", "client.py", "description.txt"]
+
+def make_staging_dir():
+    os.makedirs("games", exist_ok=True)
+    return tempfile.mkdtemp(prefix=".upload-", dir="games")
+
+def write_text(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+async def receive_game_files(conn, g_name):
+    """
+    Asks the client for each required file and streams it into a fresh
+    staging directory, so memory stays bounded regardless of file size.
+    Disk work runs in the executor; the loop only moves bytes.
+    Returns the staging directory, or None if the upload was aborted.
+    """
+    staging_dir = await asyncio.to_thread(make_staging_dir)
+    completed = False
+    try:
+        for filename in REQUIRED_FILES:
+            client_rel_path = os.path.join("games", g_name, filename)
+            await conn.send({"op": "upload", "path": client_rel_path, "stream": True})
+            file_resp = await conn.recv()
+            if not file_resp or file_resp.get("response") != "success":
+                await client_interaction(conn, f"Error uploading {filename}. Aborting.", "none")
+                return None
+
+            staged_path = os.path.join(staging_dir, filename)
+            if "file data" in file_resp:
+                # Older clients send the whole file inline
+                await asyncio.to_thread(write_text, staged_path, file_resp["file data"])
+            else:
+                try:
+                    await netutils.async_recv_file(conn.reader, conn.writer, staged_path)
+                except ValueError as e:
+                    await client_interaction(conn, f"Error uploading {filename}: {e}. Aborting.", "none")
+                    return None
+
+        completed = True
+        return staging_dir
+    finally:
+        if not completed:
+            await asyncio.to_thread(shutil.rmtree, staging_dir, ignore_errors=True)
+
+def read_description(staging_dir):
+    with open(os.path.join(staging_dir, "description.txt"), encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+def publish_game_files(staging_dir, g_name, after_version):
+    """
+    Publishes the staged files as the next free version after `after_version`
+    in the artifact store, removes the staging directory and returns the
+    new version. Earlier versions are left untouched.
+    """
+    try:
+        files = {filename: os.path.join(staging_dir, filename) for filename in REQUIRED_FILES}
+        return store.publish_next(g_name, after_version, files)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
 
 # -----------------------------------------------------------------------------
 # Main Logic: Client Handler
 # -----------------------------------------------------------------------------
 
-def handle_client(sock):
+async def handle_client(reader, writer):
     """
-    Main state machine for a connected developer client.
+    Main state machine for a connected developer client, one coroutine per session.
     Handles Menu -> Login/Register -> Session Loop (CRUD Operations).
     """
-    print(f"[Server] New connection: {sock.getpeername()}")
+    print(f"[Server] New connection: {writer.get_extra_info('peername')}")
+    conn = DevConnection(reader, writer)
     name = None # Track the logged-in user
 
     try:
+        await netutils.async_accept_negotiation(reader, writer)
+
         while True:
             # --- Step 1: Pre-Login Menu ---
             menu_text = "1. Login\n2. Register\n3. Exit"
-            response = client_interaction(sock, menu_text, ["1", "2", "3"])
+            response = await client_interaction(conn, menu_text, ["1", "2", "3"])
             if not response: break # Client disconnected
             
             choice = response.get("response")
 
             # --- Step 2: Register ---
             if choice == "2":
-                resp_name = client_interaction(sock, "Enter Name:", ["text", 20])
+                resp_name = await client_interaction(conn, "Enter Name:", ["text", 20])
                 reg_name = resp_name.get("response")
                 
-                resp_pw = client_interaction(sock, "Enter Password:", ["text", 20])
+                resp_pw = await client_interaction(conn, "Enter Password:", ["text", 20])
                 reg_password = resp_pw.get("response")
 
                 db_req = {"op": "create dev", "name": reg_name, "password": reg_password}
-                db_resp = send_db_request(db_req)
+                db_resp = await send_db_request(db_req)
 
                 if db_resp.get("status") == "success":
-                    client_interaction(sock, "Registration Successful!", "none")
+                    await client_interaction(conn, "Registration Successful!", "none")
                 else:
-                    client_interaction(sock, f"Registration Failed: Username Invalid", "none")
+                    await client_interaction(conn, f"Registration Failed: Username Invalid", "none")
 
             # --- Step 3: Login ---
             elif choice == "1":
-                resp_name = client_interaction(sock, "Enter Name:", ["text", 20])
+                resp_name = await client_interaction(conn, "Enter Name:", ["text", 20])
                 login_name = resp_name.get("response")
                 
-                resp_pw = client_interaction(sock, "Enter Password:", ["text", 20])
+                resp_pw = await client_interaction(conn, "Enter Password:", ["text", 20])
                 login_pass = resp_pw.get("response")
 
-                # Query DB
-                db_req = {"op": "query dev", "criteria": {"name": login_name}}
-                db_resp = send_db_request(db_req)
-                user_list = db_resp.get("data", [])
+                # Look the account up and claim it in one round trip: the status
+                # update only applies if the password matches and nobody is logged in
+                db_resp = await send_db_request({
+                    "op": "batch",
+                    "atomic": False,
+                    "requests": [
+                        {"op": "query dev", "criteria": {"name": login_name}},
+                        {"op": "update dev status", "name": login_name, "status": "online",
+                         "expect": {"password": login_pass, "status": "offline"}}
+                    ]
+                })
+                query_result, claim_result = db_resp.get("results", [{}, {}])
+                user_list = query_result.get("data", [])
                 
                 error_msg = None
                 if not user_list:
@@ -110,23 +204,24 @@ def handle_client(sock):
                         error_msg = "Incorrect password."
                     elif user_data.get("status") != "offline":
                         error_msg = "User is already logged in."
+                    elif claim_result.get("status") != "success":
+                        error_msg = "User is already logged in."
 
                 if error_msg:
-                    client_interaction(sock, f"Login Failed: {error_msg}", "none")
+                    await client_interaction(conn, f"Login Failed: {error_msg}", "none")
                 else:
                     # =========================================================
                     # PHASE B: SESSION LOOP (CRUD)
                     # =========================================================
                     
-                    # 1. Update status to online
+                    # 1. Status is already online (claimed by the login batch)
                     name = login_name # Store for session usage
-                    send_db_request({"op": "update dev status", "name": name, "status": "online"})
-                    client_interaction(sock, f"Welcome {name}", "none")
+                    await client_interaction(conn, f"Welcome {name}", "none")
 
                     # 2. Enter Session Loop
                     while True:
                         session_menu = "1. Upload Game\n2. Read Game\n3. Update Game\n4. Remove Game\n5. Logout"
-                        sess_resp = client_interaction(sock, session_menu, ["1", "2", "3", "4", "5"])
+                        sess_resp = await client_interaction(conn, session_menu, ["1", "2", "3", "4", "5"])
                         if not sess_resp: break
                         
                         sess_choice = sess_resp.get("response")
@@ -134,19 +229,19 @@ def handle_client(sock):
                         # --- Option 1: Upload Game (Create) ---
                         if sess_choice == "1":
                             # A. Metadata Collection & Validation
-                            g_name_resp = client_interaction(sock, "Enter Game Name:", ["text", 30])
+                            g_name_resp = await client_interaction(conn, "Enter Game Name:", ["text", 30])
                             if not g_name_resp: break 
                             g_name = g_name_resp.get("response")
 
                             # Check DB if name is taken
-                            db_check = send_db_request({"op": "query game", "criteria": {"name": g_name}})
+                            db_check = await send_db_request({"op": "query game", "criteria": {"name": g_name}})
                             if db_check.get("data"): 
-                                client_interaction(sock, f"Error: The name '{g_name}' is already taken.", "none")
+                                await client_interaction(conn, f"Error: The name '{g_name}' is already taken.", "none")
                                 continue 
 
                             # Game Type
                             type_menu = "Select Game Type:\n1. CLI\n2. GUI"
-                            g_type_resp = client_interaction(sock, type_menu, ["1", "2"])
+                            g_type_resp = await client_interaction(conn, type_menu, ["1", "2"])
                             if not g_type_resp: break
                             
                             raw_type = g_type_resp.get("response")
@@ -154,34 +249,18 @@ def handle_client(sock):
                             
                             g_players = 2
                             player_menu = "Select Players:\n[2] [3] [4] [5]"
-                            g_player_resp = client_interaction(sock, player_menu, ["2", "3", "4", "5"])
+                            g_player_resp = await client_interaction(conn, player_menu, ["2", "3", "4", "5"])
                             if not g_player_resp: break
                             g_players = int(g_player_resp.get("response"))
 
-                            # B. File Transfer Loop
-                            required_files = ["server.py", "client.py", "description.txt"]
-                            file_data_buffer = {} 
-                            upload_aborted = False
-
-                            for filename in required_files:
-                                client_rel_path = os.path.join("games", g_name, filename)
-                                netutils.send_msg(sock, {"op": "upload", "path": client_rel_path})
-                                file_resp = netutils.recv_msg(sock)
-                                if not file_resp or file_resp.get("response") != "success":
-                                    client_interaction(sock, f"Error uploading {filename}. Aborting.", "none")
-                                    upload_aborted = True
-                                    break
-                                file_data_buffer[filename] = file_resp.get("file data", "")
-
-                            if upload_aborted: continue 
+                            # B. File Transfer (streamed into a staging directory)
+                            staging_dir = await receive_game_files(conn, g_name)
+                            if not staging_dir: continue 
 
                             # C. Persist Data
                             try:
-                                save_dir = os.path.join("games", g_name)
-                                os.makedirs(save_dir, exist_ok=True)
-                                for fname, content in file_data_buffer.items():
-                                    with open(os.path.join(save_dir, fname), "w") as f:
-                                        f.write(content)
+                                description = await asyncio.to_thread(read_description, staging_dir)
+                                version = await asyncio.to_thread(publish_game_files, staging_dir, g_name, 0)
 
                                 create_game_req = {
                                     "op": "create game",
@@ -189,28 +268,29 @@ def handle_client(sock):
                                     "dev": name,
                                     "type": g_type, 
                                     "players": g_players,
-                                    "description": file_data_buffer.get("description.txt", "")
+                                    "description": description,
+                                    "version": version
                                 }
                                 
-                                db_create_resp = send_db_request(create_game_req)
+                                db_create_resp = await send_db_request(create_game_req)
                                 if db_create_resp.get("status") == "success":
-                                    client_interaction(sock, "Game uploaded successfully!", "none")
+                                    await client_interaction(conn, "Game uploaded successfully!", "none")
                                 else:
-                                    client_interaction(sock, f"DB Error: {db_create_resp.get('message')}", "none")
+                                    await client_interaction(conn, f"DB Error: {db_create_resp.get('message')}", "none")
 
                             except Exception as e:
                                 print(f"[Server] Upload Error: {e}")
-                                client_interaction(sock, "Server internal error during save.", "none")
+                                await client_interaction(conn, "Server internal error during save.", "none")
 
                         # --- Option 2: Read Game (Read) ---
                         elif sess_choice == "2":
-                            # 1. Query DB (All games, even those 'down')
-                            query_req = {"op": "query game", "criteria": {"dev": name}}
-                            query_resp = send_db_request(query_req)
+                            # 1. Query DB (All games, even those 'down'), without the full review history
+                            query_req = {"op": "query game", "criteria": {"dev": name}, "fields": GAME_INFO_FIELDS}
+                            query_resp = await send_db_request(query_req)
                             user_games = query_resp.get("data", [])
 
                             if not user_games:
-                                client_interaction(sock, "You have not uploaded any games.", "none")
+                                await client_interaction(conn, "You have not uploaded any games.", "none")
                                 continue
 
                             # 2. Build Menu
@@ -223,13 +303,13 @@ def handle_client(sock):
                                 valid_choices.append(str(idx))
 
                             # 3. Selection
-                            sel_resp = client_interaction(sock, game_list_str, valid_choices)
+                            sel_resp = await client_interaction(conn, game_list_str, valid_choices)
                             if not sel_resp: break
                             
                             target_game = user_games[int(sel_resp.get("response")) - 1]
 
                             # 4. Display Info
-                            # Format columns: name, dev, version, status, type, players, description, feedback
+                            # Format columns: name, dev, version, status, type, players, rating, description, recent feedback
                             def get_description(data):
                                 if not data: return "No description"
                                 return "\n====\n" + data + "\n===="
@@ -239,6 +319,10 @@ def handle_client(sock):
                                 for i in data:
                                     ret += f"User {i[0]} ({i[1]} stars): {i[2]}\n"
                                 return ret + "===="
+                            def get_rating(data):
+                                count = data.get("rating_count") or 0
+                                if not count: return "Not rated yet"
+                                return f"{data['rating_sum'] / count:.1f} / 5 ({count} reviews, latest {constants.RECENT_FEEDBACK} shown)"
 
                             info_text = (
                                 f"--- Game Info: {target_game['name']} ---\n"
@@ -247,25 +331,26 @@ def handle_client(sock):
                                 f"Status:      {target_game.get('status', 'unknown')}\n"
                                 f"Type:        {target_game['type']}\n"
                                 f"Players:     {target_game['players']}\n"
+                                f"Rating:      {get_rating(target_game)}\n"
                                 f"Description: {get_description(target_game['description'])}\n"
-                                f"Feedback:    {get_feedback(target_game.get('feedback', []))}\n"
+                                f"Feedback:    {get_feedback(target_game.get('recent_feedback', []))}\n"
                                 f"---------------------------------\n"
                             )
 
-                            client_interaction(sock, info_text, "none")
+                            await client_interaction(conn, info_text, "none")
 
                         # --- Option 3: Update Game (Update) ---
                         elif sess_choice == "3":
                             # 1. Query Active Games
-                            query_req = {"op": "query game", "criteria": {"dev": name}}
-                            query_resp = send_db_request(query_req)
+                            query_req = {"op": "query game", "criteria": {"dev": name}, "fields": ["version", "status"]}
+                            query_resp = await send_db_request(query_req)
                             all_games = query_resp.get("data", [])
                             
                             # Filter: Only 'up'
                             active_games = [g for g in all_games if g.get("status", "up") == "up"]
 
                             if not active_games:
-                                client_interaction(sock, "No active games found to update.", "none")
+                                await client_interaction(conn, "No active games found to update.", "none")
                                 continue
 
                             # 2. Build Menu
@@ -276,71 +361,57 @@ def handle_client(sock):
                                 game_list_str += f"{idx}. {game['name']} (v{v_num})\n"
                                 valid_choices.append(str(idx))
 
-                            sel_resp = client_interaction(sock, game_list_str, valid_choices)
+                            sel_resp = await client_interaction(conn, game_list_str, valid_choices)
                             if not sel_resp: break
                             
                             target_game = active_games[int(sel_resp.get("response")) - 1]
                             target_name = target_game["name"]
                             current_version = target_game.get("version", 1)
 
-                            # 3. File Transfer
-                            required_files = ["server.py", "client.py", "description.txt"]
-                            file_data_buffer = {}
-                            upload_aborted = False
-
-                            for filename in required_files:
-                                client_rel_path = os.path.join("games", target_name, filename)
-                                netutils.send_msg(sock, {"op": "upload", "path": client_rel_path})
-                                file_resp = netutils.recv_msg(sock)
-                                if not file_resp or file_resp.get("response") != "success":
-                                    client_interaction(sock, f"Error uploading {filename}. Aborting.", "none")
-                                    upload_aborted = True
-                                    break
-                                file_data_buffer[filename] = file_resp.get("file data", "")
-
-                            if upload_aborted: continue
+                            # 3. File Transfer (streamed into a staging directory)
+                            staging_dir = await receive_game_files(conn, target_name)
+                            if not staging_dir: continue
 
                             # 4. Save & Update DB
                             try:
-                                save_dir = os.path.join("games", target_name)
-                                os.makedirs(save_dir, exist_ok=True)
-                                for fname, content in file_data_buffer.items():
-                                    with open(os.path.join(save_dir, fname), "w") as f:
-                                        f.write(content)
+                                description = await asyncio.to_thread(read_description, staging_dir)
+                                new_version = await asyncio.to_thread(publish_game_files, staging_dir, target_name, current_version)
 
-                                new_version = current_version + 1
+                                # Only moves the game forward from the version this update started
+                                # from; a concurrent update that got there first wins
                                 update_req = {
                                     "op": "update game", 
                                     "name": target_name,
                                     "updates": {
-                                        "description": file_data_buffer.get("description.txt", ""),
+                                        "description": description,
                                         "version": new_version
-                                    }
+                                    },
+                                    "expect": {"version": current_version}
                                 }
-                                db_upd_resp = send_db_request(update_req)
+                                db_upd_resp = await send_db_request(update_req)
 
                                 if db_upd_resp.get("status") == "success":
-                                    client_interaction(sock, f"Updated '{target_name}' to v{new_version}!", "none")
+                                    await client_interaction(conn, f"Updated '{target_name}' to v{new_version}!", "none")
                                 else:
                                     err = db_upd_resp.get("message") or db_upd_resp.get("error")
-                                    client_interaction(sock, f"DB Error: {err}", "none")
+                                    await client_interaction(conn, f"DB Error: {err}", "none")
 
                             except Exception as e:
                                 print(f"[Server] Update Error: {e}")
-                                client_interaction(sock, "Server error during update.", "none")
+                                await client_interaction(conn, "Server error during update.", "none")
 
                         # --- Option 4: Remove Game (Delete) ---
                         elif sess_choice == "4":
                             # 1. Query Active Games
-                            query_req = {"op": "query game", "criteria": {"dev": name}}
-                            query_resp = send_db_request(query_req)
+                            query_req = {"op": "query game", "criteria": {"dev": name}, "fields": ["version", "status"]}
+                            query_resp = await send_db_request(query_req)
                             all_games = query_resp.get("data", [])
 
                             # Filter: Only 'up'
                             active_games = [g for g in all_games if g.get("status", "up") == "up"]
 
                             if not active_games:
-                                client_interaction(sock, "No active games found to remove.", "none")
+                                await client_interaction(conn, "No active games found to remove.", "none")
                                 continue
 
                             # 2. Build Menu
@@ -350,7 +421,7 @@ def handle_client(sock):
                                 game_list_str += f"{idx}. {game['name']}\n"
                                 valid_choices.append(str(idx))
 
-                            sel_resp = client_interaction(sock, game_list_str, valid_choices)
+                            sel_resp = await client_interaction(conn, game_list_str, valid_choices)
                             if not sel_resp: break
                             
                             target_game = active_games[int(sel_resp.get("response")) - 1]
@@ -362,17 +433,17 @@ def handle_client(sock):
                                 "name": target_name,
                                 "updates": {"status": "down"}
                             }
-                            db_resp = send_db_request(update_req)
+                            db_resp = await send_db_request(update_req)
                             
                             if db_resp.get("status") == "success":
-                                client_interaction(sock, f"Game '{target_name}' is now down.", "none")
+                                await client_interaction(conn, f"Game '{target_name}' is now down.", "none")
                             else:
                                 err = db_resp.get("message") or db_resp.get("error")
-                                client_interaction(sock, f"Error removing game: {err}", "none")
+                                await client_interaction(conn, f"Error removing game: {err}", "none")
 
                         # --- Option 5: Logout ---
                         elif sess_choice == "5":
-                            send_db_request({"op": "update dev status", "name": name, "status": "offline"})
+                            await send_db_request({"op": "update dev status", "name": name, "status": "offline"})
                             print(f"[Server] {name} logged out.")
                             return 
 
@@ -387,34 +458,42 @@ def handle_client(sock):
         print(f"[Server] Error handling client: {e}")
     finally:
         if name:
-             try: send_db_request({"op": "update dev status", "name": name, "status": "offline"})
+             try: await send_db_request({"op": "update dev status", "name": name, "status": "offline"})
              except: pass
-        sock.close()
+        totals = netutils.stats(writer)
+        print(f"[Server] Closed connection with {name if name else 'client'}: "
+              f"sent {totals['sent']} bytes ({totals['sent_wire']} on the wire), "
+              f"received {totals['received']} bytes ({totals['received_wire']} on the wire)")
+        writer.close()
 
 # -----------------------------------------------------------------------------
 # Server Startup
 # -----------------------------------------------------------------------------
 
-def start_server():
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    bind_addr = ('0.0.0.0', constants.DEV_PORT)
-    server.bind(bind_addr)
-    server.listen(5)
-    
-    print(f"[Server] Developer Server listening on {bind_addr}")
+async def log_stats():
+    """Background task: logs the DB pool statistics every STATS_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(constants.STATS_INTERVAL)
+        print(f"[Server] DB pool stats: {db_pool.stats()}")
+
+async def serve():
+    server = await asyncio.start_server(
+        handle_client, '0.0.0.0', constants.DEV_PORT,
+        backlog=constants.DEV_BACKLOG, reuse_address=True
+    )
+    print(f"[Server] Developer Server listening on {('0.0.0.0', constants.DEV_PORT)}")
+    stats_logger = asyncio.create_task(log_stats())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        stats_logger.cancel()
 
+def start_server():
     try:
-        while True:
-            client_sock, addr = server.accept()
-            t = threading.Thread(target=handle_client, args=(client_sock,))
-            t.daemon = True
-            t.start()
+        asyncio.run(serve())
     except KeyboardInterrupt:
         print("\n[Server] Shutting down...")
-    finally:
-        server.close()
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    start_server()
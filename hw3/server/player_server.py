@@ -1,11 +1,11 @@
-import socket
-import threading
+import asyncio
 import sys
 import os
 import random
 import string
 import time
-import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # -----------------------------------------------------------------------------
 # Path Setup
@@ -13,7 +13,7 @@ import subprocess
 sys.path.append('..')
 
 try:
-    from tools import constants, netutils
+    from tools import constants, netutils, dbpool, artifacts, gamerunner, gamehost
 except ImportError as e:
     print(f"Error importing tools: {e}")
     print("Ensure you are running this from the 'server/' directory or 'netprog_project/' root.")
@@ -23,22 +23,291 @@ except ImportError as e:
 # Helper Functions
 # -----------------------------------------------------------------------------
 
-def send_db_request(request_dict):
+# Long-lived connections to the DB Server, shared by all client sessions
+db_pool = dbpool.AsyncDBPool(constants.DB_HOST, constants.DB_PORT, size=constants.DB_POOL_SIZE)
+
+async def send_db_request(request_dict):
     """
-    Connects to the DB Server, sends a request, receives a response,
-    and closes the connection.
+    Sends a request to the DB Server over a pooled connection
+    and returns the response.
     """
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as db_sock:
-            db_sock.connect((constants.DB_HOST, constants.DB_PORT))
-            netutils.send_msg(db_sock, request_dict)
-            response = netutils.recv_msg(db_sock)
-            return response
+        return await db_pool.request(request_dict)
     except Exception as e:
         print(f"[Server Error] DB Communication failed: {e}")
         return {}
 
-def client_interaction(sock, text, input_type):
+# -----------------------------------------------------------------------------
+# Room Event Bus
+# -----------------------------------------------------------------------------
+
+# Guests re-check the room at least this often even if no event arrives
+ROOM_WATCH_TIMEOUT = 30
+
+class RoomEvents:
+    """
+    In-process notification bus for room state changes.
+    Every room mutation made by this server bumps the room's version number,
+    and guests sleep until the version they last saw is out of date.
+    """
+
+    def __init__(self):
+        self._rooms = {}        # Format: {room_name: [version, asyncio.Event]}, only rooms that exist
+        self._last_version = 0  # Shared by all rooms, so a recreated room never reuses a version
+
+    def version(self, room_name):
+        """
+        Returns the current version of a room (0 if it has no entry).
+        Take this BEFORE querying the DB.
+        """
+        entry = self._rooms.get(room_name)
+        return entry[0] if entry else 0
+
+    def publish(self, room_name, removed=False):
+        """Bumps the room version and wakes every session waiting on it."""
+        self._last_version += 1
+        entry = self._rooms.pop(room_name, None)
+        if entry:
+            entry[1].set()
+        if not removed:
+            self._rooms[room_name] = [self._last_version, asyncio.Event()]
+
+    async def wait(self, room_name, version, timeout=ROOM_WATCH_TIMEOUT):
+        """
+        Sleeps until the room changes from `version` or the timeout expires.
+        A room without an entry counts as changed: guests publish their join
+        before waiting, so it was removed since `version` was taken.
+        """
+        entry = self._rooms.get(room_name)
+        if entry is None or entry[0] != version:
+            return
+        try:
+            await asyncio.wait_for(entry[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+room_events = RoomEvents()
+
+async def send_room_request(request_dict):
+    """
+    Sends a room-mutating request to the DB Server and, if it succeeded,
+    notifies the guests watching that room.
+    """
+    response = await send_db_request(request_dict)
+    if response.get("status") == "success":
+        room_events.publish(request_dict["name"], removed=request_dict["op"] == "remove room")
+    return response
+
+async def send_room_batch(requests):
+    """
+    Runs several room-mutating requests in one round trip and one DB
+    transaction (all or nothing), then notifies the guests of each room
+    if it succeeded.
+    """
+    response = await send_db_request({"op": "batch", "requests": requests})
+    if response.get("status") == "success":
+        for room_name in {r["name"] for r in requests}:
+            room_events.publish(room_name)
+    return response
+
+# -----------------------------------------------------------------------------
+# Catalog Cache
+# -----------------------------------------------------------------------------
+
+# Games per store page, and the columns the store menu needs
+STORE_PAGE_SIZE = 10
+STORE_FIELDS = ["name", "version", "players"]
+
+# Rows per request while loading the catalog (keeps each response well under MAX_MSG_SIZE)
+CATALOG_LOAD_BATCH = 500
+
+# While the catalog watch is down, a loaded catalog is trusted for this many seconds
+CATALOG_TTL = 10
+
+# Long-poll timeout of each watch request, and the delay before re-trying a failed one
+CATALOG_WATCH_TIMEOUT = 30
+CATALOG_RETRY_DELAY = 2
+
+class CatalogCache:
+    """
+    Read-through cache of the store listing (STORE_FIELDS of every game).
+    watch() long-polls the DB Server's catalog version and drops the cache
+    whenever a developer uploads or updates a game, so rendering the store
+    costs no DB round trip until something actually changed. If the watch
+    is down, the cache expires after CATALOG_TTL seconds instead.
+    """
+
+    def __init__(self, watch_pool):
+        self.watch_pool = watch_pool    # Dedicated connection for the long-poll
+        self.version = None             # Last catalog version seen by watch()
+        self.watching = False
+        self._games = None
+        self._loaded_at = 0.0
+        self._generation = 0            # Bumped on invalidate(); loads started earlier are not kept
+        self._loading = None            # Load in progress, shared by concurrent renders
+
+    def invalidate(self):
+        self._games = None
+        self._loading = None
+        self._generation += 1
+
+    async def games(self):
+        """Returns the listing of every game, in upload order."""
+        if self._games is not None and (self.watching or time.monotonic() - self._loaded_at < CATALOG_TTL):
+            return self._games
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        # Shielded: a session that disconnects must not cancel everyone's load
+        return await asyncio.shield(self._loading)
+
+    async def page(self, offset, limit):
+        return (await self.games())[offset:offset + limit]
+
+    async def _load(self):
+        generation = self._generation
+        try:
+            games = []
+            while True:
+                resp = await send_db_request({
+                    "op": "query game",
+                    "criteria": {},
+                    "fields": STORE_FIELDS,
+                    "limit": CATALOG_LOAD_BATCH,
+                    "offset": len(games)
+                })
+                if resp.get("status") != "success":
+                    return games  # DB unavailable: show what we have, cache nothing
+                games += resp["data"]
+                if len(resp["data"]) < CATALOG_LOAD_BATCH:
+                    break
+
+            if generation == self._generation:
+                self._games = games
+                self._loaded_at = time.monotonic()
+            return games
+        finally:
+            if self._loading is asyncio.current_task():
+                self._loading = None
+
+    async def watch(self):
+        """Background task: follows the catalog version for the life of the server."""
+        while True:
+            try:
+                resp = await self.watch_pool.request({
+                    "op": "watch catalog",
+                    "version": self.version,
+                    "timeout": CATALOG_WATCH_TIMEOUT
+                })
+                version = resp.get("version")
+                if version is None:
+                    raise ValueError(resp.get("message", "no version in response"))
+            except Exception as e:
+                if self.watching:
+                    print(f"[Server] Catalog watch lost, falling back to a {CATALOG_TTL}s cache: {e}")
+                self.watching = False
+                self.version = None
+                await asyncio.sleep(CATALOG_RETRY_DELAY)
+                continue
+
+            if version != self.version:
+                self.version = version
+                self.invalidate()
+            self.watching = True
+
+catalog = CatalogCache(dbpool.AsyncDBPool(constants.DB_HOST, constants.DB_PORT, size=1))
+
+class PlayerConnection:
+    """The asyncio streams of one player client."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, message):
+        await netutils.async_send_msg(self.writer, message)
+
+    async def recv(self):
+        return await netutils.async_recv_msg(self.reader)
+
+# Reviews per page of a game's All Reviews screen
+REVIEWS_PAGE_SIZE = 10
+
+def format_feedback(data):
+    if not data: return "No feedback"
+    ret = "\n====\n"
+    for i in data:
+        ret += f"User {i[0]} ({i[1]} stars): {i[2]}\n"
+    return ret + "===="
+
+def format_rating(record):
+    count = record.get("rating_count") or 0
+    if not count: return "Not rated yet"
+    return f"{record['rating_sum'] / count:.1f} / 5 ({count} review{'s' if count != 1 else ''})"
+
+class PlayerSession:
+    """
+    What a logged-in player's session knows about its own state: the
+    player's library (from the login query) and the full records of the
+    games the player has opened. Writes go through the session and update
+    it in place, so the game menus only read from the DB Server when
+    something actually changed.
+    """
+
+    # Columns of a game's record: its rating aggregates and latest reviews,
+    # never the full review history
+    RECORD_FIELDS = ["name", "version", "players", "description",
+                     "rating_sum", "rating_count", "recent_feedback"]
+
+    def __init__(self, name, library):
+        self.name = name
+        self.library = dict(library)    # Format: {game_name: version}
+        self._game_records = {}         # Format: {game_name: game record}
+
+    async def game_record(self, game_name):
+        """Returns a game's record (description, rating, recent reviews), or None if it is gone."""
+        record = self._game_records.get(game_name)
+        if record is None:
+            resp = await send_db_request({
+                "op": "query game",
+                "criteria": {"name": game_name},
+                "fields": self.RECORD_FIELDS
+            })
+            if not resp.get("data"):
+                return None
+            record = self._game_records[game_name] = resp["data"][0]
+        return record
+
+    def forget_game(self, game_name):
+        """Drops a cached record, so the next visit sees other players' reviews."""
+        self._game_records.pop(game_name, None)
+
+    async def set_game_version(self, game_name, version):
+        """Adds a game to the library, or records the version now installed."""
+        resp = await send_db_request({
+            "op": "update player games",
+            "name": self.name,
+            "action": "update version" if game_name in self.library else "add game",
+            "payload": [game_name, version]
+        })
+        if resp.get("status") == "success":
+            self.library[game_name] = version
+        return resp
+
+    async def add_feedback(self, game_name, stars, comment):
+        resp = await send_db_request({
+            "op": "add feedback",
+            "name": game_name,
+            "feedback": [self.name, stars, comment]
+        })
+        record = self._game_records.get(game_name)
+        if resp.get("status") == "success" and record is not None:
+            # Same bookkeeping as the DB Server does
+            record["rating_sum"] += stars
+            record["rating_count"] += 1
+            record["recent_feedback"] = ([[self.name, stars, comment]] + record["recent_feedback"])[:constants.RECENT_FEEDBACK]
+        return resp
+
+async def client_interaction(conn, text, input_type):
     """
     Helper to standardize the 'display' operation protocol.
     """
@@ -47,61 +316,364 @@ def client_interaction(sock, text, input_type):
         "text": text,
         "input": input_type
     }
-    netutils.send_msg(sock, msg)
+    await conn.send(msg)
     if input_type == "none":
         return None
-    return netutils.recv_msg(sock)
+    return await conn.recv()
+
+# Immutable, versioned copies of every uploaded game (published by dev_server)
+store = artifacts.ArtifactStore()
 
-def read_game_file(game_name):
+# Files a player needs locally to join a game
+PLAYER_FILES = ["client.py"]
+
+async def sync_game_files(conn, user_name, game_name, version):
     """
-    Reads the client.py file for a specific game from the server's storage.
+    Brings the player's local copy of a game up to `version`. The client
+    reports the SHA-256 of the files it already has, and only files that
+    differ from the version's manifest are streamed.
+    Returns the number of files sent, or None if the download failed.
     """
-    file_path = os.path.join("games", game_name, "client.py")
-    if not os.path.exists(file_path):
+    manifest = await asyncio.to_thread(store.manifest, game_name, version)
+    if manifest is None:
+        # A game uploaded before the artifact store existed; `version` is the
+        # game's current version, the only one its legacy folder may become
+        manifest = await asyncio.to_thread(store.import_legacy, game_name, version)
+    if not manifest or any(f not in manifest["files"] for f in PLAYER_FILES):
+        await client_interaction(conn, "Error: Game file missing on server.", "none")
         return None
+
+    paths = {f: os.path.join("games", user_name, game_name, f) for f in PLAYER_FILES}
+    await conn.send({"op": "hashes", "paths": list(paths.values())})
+    reply = await conn.recv()
+    if reply is None:
+        raise ConnectionResetError("Client closed the connection")
+    local_hashes = reply.get("hashes", {})
+
+    sent = 0
+    for filename, save_path in paths.items():
+        sha = manifest["files"][filename]
+        if local_hashes.get(save_path) == sha:
+            continue
+
+        # Stream the file in chunks; the client checks it against the manifest hash
+        await conn.send({"op": "save", "path": save_path, "stream": True, "sha256": sha})
+        try:
+            source = await asyncio.to_thread(store.blob_source, sha)
+            await netutils.async_send_file(conn.reader, conn.writer, source)
+        except ConnectionError as e:
+            print(f"[Server] Download of {game_name} failed: {e}")
+            await client_interaction(conn, "Error: Download failed.", "none")
+            return None
+        sent += 1
+    return sent
+
+# Warm workers for game servers, started by start_server()
+game_runner = None
+
+# Threads that wait for game server processes to exit, at most one per game port
+game_waiters = ThreadPoolExecutor(max_workers=constants.GAME_PORT_R - constants.GAME_PORT_L)
+
+# Shared process for games that support hosting many rooms (HOSTED_GAME), started by start_server()
+game_host = None
+
+# Room tokens of active hosted rooms, for guests to join. Format: {room_name: token}
+hosted_rooms = {}
+
+# Game ports, each handed out already bound and listening
+port_allocator = gamerunner.PortAllocator('0.0.0.0', constants.GAME_PORT_L, constants.GAME_PORT_R)
+
+class GameServer:
+    """
+    A game server started for one match by start_game_server(): a room in the
+    shared game host, or a process of its own listening on `port`. The port
+    is given back as soon as the game is over.
+    """
+
+    def __init__(self, port, hosted=None, process=None, listener=None):
+        self.port = port
+        self.hosted = hosted
+        self.process = process
+        self.listener = listener
+        self._over = asyncio.ensure_future(self._watch())
+
+    async def _watch(self):
+        try:
+            if self.hosted:
+                await self.hosted.wait()
+            else:
+                await asyncio.get_running_loop().run_in_executor(game_waiters, self.process.wait)
+        finally:
+            self.close()
+
+    def connect_msg(self, user_name, game_name):
+        """The command that makes a player's client launch the game and connect."""
+        msg = {
+            "op": "connect",
+            "game_path": os.path.join("games", user_name, game_name, "client.py"),
+            "host": constants.PLAY_HOST,
+            "port": self.port
+        }
+        if self.hosted:
+            msg["room"] = self.hosted.token
+        return msg
+
+    async def wait(self):
+        """Sleeps until the game is over. Any number of sessions may wait."""
+        await asyncio.shield(self._over)
+
+    def close(self):
+        """Gives back the game's own port, if it has one. Safe to call twice."""
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            port_allocator.release(self.port)
+
+async def start_game_server(game_name, game_version, player_limit):
+    """
+    Starts a game server for one match: a room in the shared game host if the
+    game supports it, otherwise a process of its own on a warm worker.
+    Returns a GameServer; raises RuntimeError with a message for the players.
+    """
+    # Runs from the version's own directory in the artifact store,
+    # so publishing a newer version cannot swap files underneath it
+    game_dir = await asyncio.to_thread(store.checkout, game_name, game_version)
+    if not game_dir:
+        raise RuntimeError("Game server files missing.")
+
+    # Path: games/.store/versions/game_name/<game_version>-<files hash>/server.py
+    game_server_path = os.path.join(game_dir, "server.py")
+
+    hosted = await game_host.open_room(game_server_path, player_limit)
+    if hosted:
+        print(f"[Server] Opened {game_name} room {hosted.token} on the game host")
+        return GameServer(game_host.port, hosted=hosted)
+
+    reserved = port_allocator.acquire()
+    if not reserved:
+        raise RuntimeError("No free ports available.")
+    port, listener = reserved
+
+    # Launch the process on a warm worker; the port is already
+    # listening when this returns, so clients can connect right away
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception as e:
-        print(f"[Server Error] Could not read game file {file_path}: {e}")
-        return None
+        process = game_runner.start(game_server_path, listener)
+    except Exception:
+        listener.close()
+        port_allocator.release(port)
+        raise
+    print(f"[Server] Launched {game_name} on port {port} (PID: {process.pid})")
+    return GameServer(port, process=process, listener=listener)
+
+async def show_reviews(conn, game_name):
+    """Pages through a game's full review history, newest first."""
+    offset = 0
+    while True:
+        resp = await send_db_request({
+            "op": "query feedback",
+            "name": game_name,
+            "limit": REVIEWS_PAGE_SIZE + 1,
+            "offset": offset
+        })
+        reviews = resp.get("data", [])
+        has_next = len(reviews) > REVIEWS_PAGE_SIZE
+        reviews = reviews[:REVIEWS_PAGE_SIZE]
+
+        text = f"--- Reviews: {game_name} ---\n" + format_feedback(reviews)
+        nav = []
+        if has_next:
+            nav.append(("next", "Next Page"))
+        if offset:
+            nav.append(("prev", "Previous Page"))
+        nav.append(("back", "Back"))
+        for idx, (_, label) in enumerate(nav, 1):
+            text += f"\n{idx}. {label}"
+
+        resp = await client_interaction(conn, text, [str(i) for i in range(1, len(nav) + 1)])
+        if not resp:
+            return
+        action = nav[int(resp.get("response")) - 1][0]
+        if action == "next":
+            offset += REVIEWS_PAGE_SIZE
+        elif action == "prev":
+            offset = max(0, offset - REVIEWS_PAGE_SIZE)
+        else:
+            return
 
-def get_random_free_port():
+# -----------------------------------------------------------------------------
+# Quick Play Matchmaking
+# -----------------------------------------------------------------------------
+
+# A player waits at most this long for a Quick Play group before going back to the lobby
+QUICK_PLAY_TIMEOUT = 120
+
+class QuickPlayTicket:
+    """One player's place in a Quick Play queue."""
+
+    def __init__(self, user_name):
+        self.user_name = user_name
+        self.joined = time.monotonic()
+        # Resolved with the group's GameServer, or None if it could not be started
+        self.match = asyncio.get_running_loop().create_future()
+
+class QuickPlayQueue:
     """
-    Finds a free port in the range [GAME_PORT_L, GAME_PORT_R).
+    In-memory FIFO queues of players waiting for a Quick Play match, one per
+    game version. The player whose arrival fills a group takes the oldest
+    `group_size` tickets off the queue and starts the game for all of them;
+    the others sleep on their ticket until then.
+    Must be used from a single event loop.
     """
-    ports = list(range(constants.GAME_PORT_L, constants.GAME_PORT_R))
-    random.shuffle(ports)
 
-    for port in ports:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            try:
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                # Bind to the interface specified in constants (usually 0.0.0.0 or localhost)
-                sock.bind((constants.PLAY_HOST, port))
-                return port
-            except OSError:
-                continue
-    return None
+    def __init__(self):
+        self._queues = {}  # Format: {(game_name, version): deque of QuickPlayTicket}
+        self._stats = {
+            "joined": 0,
+            "left": 0,            # Timed out or disconnected while queued
+            "matched": 0,
+            "wait_time": 0.0,     # From joining the queue until the group is full
+            "max_wait": 0.0,
+            "groups": 0,
+            "failed": 0,          # Groups whose game server could not be started
+            "assembly_time": 0.0, # From a full group until its game server is up
+            "max_assembly": 0.0,
+        }
+
+    def join(self, key, ticket, group_size):
+        """Queues a ticket. Returns the group (oldest first) if this filled one, otherwise None."""
+        queue = self._queues.setdefault(key, deque())
+        queue.append(ticket)
+        self._stats["joined"] += 1
+        if len(queue) < group_size:
+            return None
+
+        group = [queue.popleft() for _ in range(group_size)]
+        if not queue:
+            del self._queues[key]
+        now = time.monotonic()
+        for t in group:
+            self._stats["wait_time"] += now - t.joined
+            self._stats["max_wait"] = max(self._stats["max_wait"], now - t.joined)
+        self._stats["matched"] += group_size
+        return group
+
+    def leave(self, key, ticket):
+        """Takes a ticket off its queue. Returns False if it already left in a group."""
+        queue = self._queues.get(key)
+        if not queue or ticket not in queue:
+            return False
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[key]
+        self._stats["left"] += 1
+        return True
+
+    def waiting(self, key):
+        """Number of players in a queue."""
+        return len(self._queues.get(key, ()))
+
+    def record_assembly(self, started, ok):
+        """Records a group's game server start, which began at `started` (time.monotonic())."""
+        if not ok:
+            self._stats["failed"] += 1
+            return
+        elapsed = time.monotonic() - started
+        self._stats["groups"] += 1
+        self._stats["assembly_time"] += elapsed
+        self._stats["max_assembly"] = max(self._stats["max_assembly"], elapsed)
+
+    def stats(self):
+        """Returns a snapshot of the matchmaking statistics."""
+        snapshot = dict(self._stats)
+        snapshot["waiting"] = sum(len(q) for q in self._queues.values())
+        snapshot["avg_wait"] = snapshot["wait_time"] / snapshot["matched"] if snapshot["matched"] else 0.0
+        snapshot["avg_assembly"] = snapshot["assembly_time"] / snapshot["groups"] if snapshot["groups"] else 0.0
+        return snapshot
+
+quick_play = QuickPlayQueue()
+
+async def wait_for_quick_match(conn, key, ticket):
+    """
+    Sleeps until the ticket's group has a game server and returns it.
+    Returns None if the group's game could not be started or no group filled
+    within QUICK_PLAY_TIMEOUT; a client that disconnects leaves the queue.
+    """
+    # The client sends nothing while it waits, so this read only completes when it hangs up
+    hangup = asyncio.ensure_future(conn.recv())
+    try:
+        await asyncio.wait({ticket.match, hangup}, timeout=QUICK_PLAY_TIMEOUT,
+                           return_when=asyncio.FIRST_COMPLETED)
+        if not ticket.match.done() and quick_play.leave(key, ticket):
+            if hangup.done():
+                raise ConnectionResetError("Client closed the connection")
+            return None
+        # Already in a group whose game server is starting
+        return await ticket.match
+    finally:
+        hangup.cancel()
+        quick_play.leave(key, ticket)
+        # Let the read finish cancelling before the lobby reads from the connection again
+        await asyncio.gather(hangup, return_exceptions=True)
+
+async def handle_quick_play(conn, user_name, game_name, game_version, player_limit):
+    """
+    Queues the player for a game and plays one match as soon as
+    `player_limit` players are waiting for it.
+    """
+    key = (game_name, game_version)
+    ticket = QuickPlayTicket(user_name)
+    group = quick_play.join(key, ticket, player_limit)
+
+    if group is None:
+        await client_interaction(conn, f"Searching for players ({quick_play.waiting(key)}/{player_limit})...", "none")
+        game = await wait_for_quick_match(conn, key, ticket)
+        if game is None:
+            reason = "Could not start the match." if ticket.match.done() else "No match found."
+            await client_interaction(conn, f"{reason} Returning to lobby...", "none")
+            return
+    else:
+        # This player completed the group: start the game for everyone in it
+        started = time.monotonic()
+        try:
+            game = await start_game_server(game_name, game_version, player_limit)
+        except Exception as e:
+            print(f"[Server] Failed to launch Quick Play match of {game_name}: {e}")
+            game = None
+        quick_play.record_assembly(started, game is not None)
+        for t in group:
+            t.match.set_result(game)
+        if game is None:
+            await client_interaction(conn, "Error: Could not start the match. Returning to lobby...", "none")
+            return
+        print(f"[Server] Quick Play: {game_name} started for {', '.join(t.user_name for t in group)} "
+              f"in {time.monotonic() - started:.2f}s (longest wait {started - group[0].joined:.1f}s)")
+
+    await conn.send(game.connect_msg(user_name, game_name))
+    await game.wait()
+    await client_interaction(conn, "Game finished. Returning to lobby...", "none")
 
 # -----------------------------------------------------------------------------
 # New Logic: Game Lobby (Room System)
 # -----------------------------------------------------------------------------
 
-def handle_game_lobby(sock, user_name, game_name, player_limit):
+async def handle_game_lobby(conn, user_name, game_name, game_version, player_limit):
     """
-    Manages the Create Room / Join Room / Back flow.
+    Manages the Create Room / Join Room / Quick Play / Back flow.
     """
     while True:
-        menu_text = f"--- {game_name} Lobby ---\n1. Create Room\n2. Join Room\n3. Back"
-        resp = client_interaction(sock, menu_text, ["1", "2", "3"])
+        menu_text = f"--- {game_name} Lobby ---\n1. Create Room\n2. Join Room\n3. Quick Play\n4. Back"
+        resp = await client_interaction(conn, menu_text, ["1", "2", "3", "4"])
         if not resp: break
         choice = resp.get("response")
 
-        # === 3. BACK ===
-        if choice == "3":
+        # === 4. BACK ===
+        if choice == "4":
             return
 
+        # === 3. QUICK PLAY ===
+        elif choice == "3":
+            await handle_quick_play(conn, user_name, game_name, game_version, player_limit)
+
         # === 1. CREATE ROOM ===
         elif choice == "1":
             room_name = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
@@ -114,105 +686,95 @@ def handle_game_lobby(sock, user_name, game_name, player_limit):
                 "host": user_name,
                 "player_limit": player_limit
             }
-            db_resp = send_db_request(req)
+            db_resp = await send_db_request(req)
 
             if db_resp.get("status") != "success":
-                client_interaction(sock, f"Error creating room: {db_resp.get('message')}", "none")
+                await client_interaction(conn, f"Error creating room: {db_resp.get('message')}", "none")
                 continue
 
             # HOST LOOP
             while True:
                 host_menu = f"--- Room: {room_name} (Host) ---\n1. Start Game\n2. Delete Room"
-                h_resp = client_interaction(sock, host_menu, ["1", "2"])
+                h_resp = await client_interaction(conn, host_menu, ["1", "2"])
                 if not h_resp: break
                 h_choice = h_resp.get("response")
 
                 if h_choice == "1": # Start Game
                     # 1. Check if room is full
                     q_req = {"op": "query room", "criteria": {"name": room_name}}
-                    q_resp = send_db_request(q_req)
+                    q_resp = await send_db_request(q_req)
                     rooms = q_resp.get("data", [])
                     
                     if not rooms:
-                        client_interaction(sock, "Error: Room not found.", "none")
+                        await client_interaction(conn, "Error: Room not found.", "none")
                         break
                     
                     room_data = rooms[0]
                     current_count = 1 + len(room_data.get("guests", []))
 
                     if current_count < player_limit:
-                        client_interaction(sock, f"Room not full ({current_count}/{player_limit}). Cannot start.", "none")
+                        await client_interaction(conn, f"Room not full ({current_count}/{player_limit}). Cannot start.", "none")
                     else:
                         # --- START GAME SEQUENCE (HOST) ---
-                        
-                        # A. Find Free Port
-                        port = get_random_free_port()
-                        if not port:
-                            client_interaction(sock, "Error: No free ports available.", "none")
+
+                        # A. Launch the Game Server: a room in the shared game host if the
+                        #    game supports it, otherwise a process of its own
+                        try:
+                            game = await start_game_server(game_name, game_version, player_limit)
+                        except RuntimeError as e:
+                            await client_interaction(conn, f"Error: {e}", "none")
                             continue
+                        except Exception as e:
+                            print(f"[Server] Failed to launch game: {e}")
+                            await client_interaction(conn, f"Server Error: {e}", "none")
+                            continue
+                        if game.hosted:
+                            hosted_rooms[room_name] = game.hosted.token
+
+                        # B + C. Update Room Port and set Status to Active (one transaction)
+                        await send_room_batch([
+                            {"op": "update room port", "name": room_name, "port": game.port},
+                            {"op": "update room status", "name": room_name, "status": "active"}
+                        ])
 
-                        # B. Update Room Port in DB
-                        send_db_request({
-                            "op": "update room port",
-                            "name": room_name,
-                            "port": port
-                        })
-
-                        # C. Update Status to Active
-                        send_db_request({
-                            "op": "update room status", 
-                            "name": room_name, 
-                            "status": "active"
-                        })
-
-                        # D. Launch Game Server Subprocess
-                        # Path: games/game_name/server.py
-                        game_server_path = os.path.join("games", game_name, "server.py")
-                        
                         try:
-                            # Launch the process
-                            process = subprocess.Popen([sys.executable, game_server_path, '0.0.0.0', str(port)])
-                            print(f"[Server] Launched {game_name} on port {port} (PID: {process.pid})")
-
-                            # E. Send Connect Command to Client
-                            client_path = os.path.join("games", user_name, game_name, "client.py")
-                            connect_msg = {
-                                "op": "connect",
-                                "game_path": client_path,
-                                "host": constants.PLAY_HOST,
-                                "port": port
-                            }
-                            netutils.send_msg(sock, connect_msg)
-
-                            # F. Wait for Game to End
-                            # The Host Player Server thread blocks here until the game server process exits
-                            process.wait()
-                            print(f"[Server] Game {game_name} (PID: {process.pid}) finished.")
+                            # D. Send Connect Command to Client
+                            await conn.send(game.connect_msg(user_name, game_name))
+
+                            # E. Wait for Game to End
+                            # The host's session sleeps here until the game is over
+                            await game.wait()
+                            print(f"[Server] Game {game_name} in room {room_name} finished.")
 
                         except Exception as e:
                             print(f"[Server] Failed to launch game: {e}")
-                            client_interaction(sock, f"Server Error: {e}", "none")
+                            await client_interaction(conn, f"Server Error: {e}", "none")
+                        finally:
+                            hosted_rooms.pop(room_name, None)
+                            game.close()
                         
-                        # G. Cleanup (Set Inactive and Port 0)
-                        send_db_request({"op": "update room status", "name": room_name, "status": "inactive"})
-                        send_db_request({"op": "update room port", "name": room_name, "port": 0})
+                        # F. Cleanup (Set Inactive and Port 0)
+                        await send_room_batch([
+                            {"op": "update room status", "name": room_name, "status": "inactive"},
+                            {"op": "update room port", "name": room_name, "port": 0}
+                        ])
                         
                         # Loop continues -> Returns to Host Menu
 
                 elif h_choice == "2": # Delete Room
-                    send_db_request({"op": "remove room", "name": room_name})
-                    client_interaction(sock, "Room deleted.", "none")
+                    await send_room_request({"op": "remove room", "name": room_name})
+                    await client_interaction(conn, "Room deleted.", "none")
                     break # Break Host Loop
 
         # === 2. JOIN ROOM ===
         elif choice == "2":
             # List rooms for this game
             q_req = {"op": "query room", "criteria": {"game": game_name}}
-            q_resp = send_db_request(q_req)
+            q_resp = await send_db_request(q_req)
             rooms = q_resp.get("data", [])
 
             if not rooms:
-                client_interaction(sock, "No rooms found for this game.", "none")
+                await client_interaction(conn, "No rooms found for this game.", "none")
                 continue
 
             # Construct Room Selection Menu
@@ -230,7 +792,7 @@ def handle_game_lobby(sock, user_name, game_name, player_limit):
             room_menu += f"{back_idx}. Back"
             valid_inputs.append(str(back_idx))
 
-            r_resp = client_interaction(sock, room_menu, valid_inputs)
+            r_resp = await client_interaction(conn, room_menu, valid_inputs)
             if not r_resp: break
             
             sel_idx = int(r_resp.get("response"))
@@ -240,30 +802,28 @@ def handle_game_lobby(sock, user_name, game_name, player_limit):
             target_room = rooms[sel_idx - 1]
             t_name = target_room['name']
 
-            # Check Full Locally first
-            curr_p = 1 + len(target_room.get('guests', []))
-            if curr_p >= target_room['player_limit']:
-                client_interaction(sock, "Room is full.", "none")
-                continue
-
-            # Add Guest to DB
+            # Join Atomically (the DB checks capacity and status in the same transaction)
             join_req = {
-                "op": "update room guests",
+                "op": "join room",
                 "name": t_name,
-                "action": "add guest",
                 "guest_name": user_name
             }
-            send_db_request(join_req)
-            client_interaction(sock, f"Joined {t_name}. Waiting for host...", "none")
+            join_resp = await send_room_request(join_req)
+            if join_resp.get("status") != "success":
+                await client_interaction(conn, f"Cannot join {t_name}: {join_resp.get('message')}", "none")
+                continue
+
+            await client_interaction(conn, f"Joined {t_name}. Waiting for host...", "none")
 
             # GUEST WAITING LOOP
+            # Sleeps on the room event bus and re-checks the DB only when the room changes
             room_deleted = False
             while True:
-                time.sleep(1) # Check every 1 second
-                
+                seen_version = room_events.version(t_name)
+
                 # Check Room Status
                 chk_req = {"op": "query room", "criteria": {"name": t_name}}
-                chk_resp = send_db_request(chk_req)
+                chk_resp = await send_db_request(chk_req)
                 data = chk_resp.get("data", [])
 
                 if not data:
@@ -278,6 +838,7 @@ def handle_game_lobby(sock, user_name, game_name, player_limit):
                     game_port = r_data.get("port")
                     if not game_port:
                         print("[Server] Error: Room active but no port found.")
+                        await room_events.wait(t_name, seen_version)
                         continue
 
                     # 1. Send Connect Command to Client
@@ -288,15 +849,17 @@ def handle_game_lobby(sock, user_name, game_name, player_limit):
                         "host": constants.PLAY_HOST,
                         "port": game_port
                     }
-                    netutils.send_msg(sock, connect_msg)
+                    if t_name in hosted_rooms:
+                        connect_msg["room"] = hosted_rooms[t_name]
+                    await conn.send(connect_msg)
                     
                     # 2. Monitor Loop (Wait for Game End)
                     # The client is currently running the game. We just wait for the room to close.
                     while True:
-                        time.sleep(1)
+                        inner_version = room_events.version(t_name)
                         # Check if room is still active
                         chk_req_inner = {"op": "query room", "criteria": {"name": t_name}}
-                        chk_resp_inner = send_db_request(chk_req_inner)
+                        chk_resp_inner = await send_db_request(chk_req_inner)
                         data_inner = chk_resp_inner.get("data", [])
 
                         if not data_inner:
@@ -306,68 +869,88 @@ def handle_game_lobby(sock, user_name, game_name, player_limit):
                         if data_inner[0].get("status") == "inactive":
                             # Game Over
                             break
+
+                        await room_events.wait(t_name, inner_version)
                     
                     if room_deleted: break
                     
                     # If we break here, it means status went back to 'inactive'.
                     # Send user back to waiting state (or lobby).
-                    client_interaction(sock, "Game finished. Returning to lobby...", "none")
+                    await client_interaction(conn, "Game finished. Returning to lobby...", "none")
                     # Break the outer loop to return to Lobby Menu? 
                     # Usually, guests stay in the room for the next match unless they leave.
                     # We will stay in the Guest Waiting Loop.
                     continue
 
+                # Still waiting for the host: sleep until the room changes
+                await room_events.wait(t_name, seen_version)
+
             if room_deleted:
-                client_interaction(sock, "Host closed the room.", "none")
+                await client_interaction(conn, "Host closed the room.", "none")
 
 # -----------------------------------------------------------------------------
 # Main Logic: Client Handler
 # -----------------------------------------------------------------------------
 
-def handle_client(sock):
+async def handle_client(reader, writer):
     """
-    Main state machine for a connected player client.
+    Main state machine for a connected player client, one coroutine per session.
     """
-    print(f"[Server] New connection: {sock.getpeername()}")
+    print(f"[Server] New connection: {writer.get_extra_info('peername')}")
+    conn = PlayerConnection(reader, writer)
     name = None 
+    session = None    # PlayerSession while logged in
+    store_offset = 0  # First game on the store page being shown
 
     try:
+        await netutils.async_accept_negotiation(reader, writer)
+
         while True:
             # --- Step 1: Pre-Login Menu ---
             if not name:
                 menu_text = "1. Login\n2. Register\n3. Exit"
-                response = client_interaction(sock, menu_text, ["1", "2", "3"])
+                response = await client_interaction(conn, menu_text, ["1", "2", "3"])
                 if not response: break 
                 
                 choice = response.get("response")
 
                 # --- Step 2: Register ---
                 if choice == "2":
-                    resp_name = client_interaction(sock, "Enter Name:", ["text", 20])
+                    resp_name = await client_interaction(conn, "Enter Name:", ["text", 20])
                     reg_name = resp_name.get("response")
                     
-                    resp_pw = client_interaction(sock, "Enter Password:", ["text", 20])
+                    resp_pw = await client_interaction(conn, "Enter Password:", ["text", 20])
                     reg_password = resp_pw.get("response")
 
                     db_req = {"op": "create player", "name": reg_name, "password": reg_password}
-                    db_resp = send_db_request(db_req)
+                    db_resp = await send_db_request(db_req)
 
                     if db_resp.get("status") == "success":
-                        client_interaction(sock, "Registration Successful!", "none")
+                        await client_interaction(conn, "Registration Successful!", "none")
                     else:
-                        client_interaction(sock, f"Registration Failed: Username Invalid", "none")
+                        await client_interaction(conn, f"Registration Failed: Username Invalid", "none")
 
                 # --- Step 3: Login ---
                 elif choice == "1":
-                    resp_name = client_interaction(sock, "Enter Name:", ["text", 20])
+                    resp_name = await client_interaction(conn, "Enter Name:", ["text", 20])
                     login_name = resp_name.get("response")
                     
-                    resp_pw = client_interaction(sock, "Enter Password:", ["text", 20])
+                    resp_pw = await client_interaction(conn, "Enter Password:", ["text", 20])
                     login_pass = resp_pw.get("response")
 
-                    db_req = {"op": "query player", "criteria": {"name": login_name}}
-                    db_resp = send_db_request(db_req)
-                    user_list = db_resp.get("data", [])
+                    # Look the account up and claim it in one round trip: the status
+                    # update only applies if the password matches and nobody is logged in
+                    db_resp = await send_db_request({
+                        "op": "batch",
+                        "atomic": False,
+                        "requests": [
+                            {"op": "query player", "criteria": {"name": login_name}},
+                            {"op": "update player status", "name": login_name, "status": "online",
+                             "expect": {"password": login_pass, "status": "offline"}}
+                        ]
+                    })
+                    query_result, claim_result = db_resp.get("results", [{}, {}])
+                    user_list = query_result.get("data", [])
                     
                     error_msg = None
                     if not user_list:
@@ -378,13 +961,15 @@ def handle_client(sock):
                             error_msg = "Incorrect password."
                         elif user_data.get("status") != "offline":
                             error_msg = "User is already logged in."
+                        elif claim_result.get("status") != "success":
+                            error_msg = "User is already logged in."
 
                     if error_msg:
-                        client_interaction(sock, f"Login Failed: {error_msg}", "none")
+                        await client_interaction(conn, f"Login Failed: {error_msg}", "none")
                     else:
                         name = login_name
-                        send_db_request({"op": "update player status", "name": name, "status": "online"})
-                        client_interaction(sock, f"Welcome {name}", "none")
+                        session = PlayerSession(name, user_data.get("games", []))
+                        await client_interaction(conn, f"Welcome {name}", "none")
 
                 # --- Step 4: Exit ---
                 elif choice == "3":
@@ -394,26 +979,48 @@ def handle_client(sock):
             # PHASE B: SESSION LOOP (User is Logged In)
             # =========================================================
             else:
-                games_req = {"op": "query game", "criteria": {}} 
-                games_resp = send_db_request(games_req)
-                games_list = games_resp.get("data", [])
+                # One page of the cached catalog; one extra row tells whether there is a next page
+                games_list = await catalog.page(store_offset, STORE_PAGE_SIZE + 1)
+                if not games_list and store_offset:
+                    store_offset = 0  # Page emptied since it was shown
+                    continue
+                has_next = len(games_list) > STORE_PAGE_SIZE
+                games_list = games_list[:STORE_PAGE_SIZE]
 
                 store_menu = "--- Game Store ---\n"
                 for idx, g in enumerate(games_list):
                     store_menu += f"{idx + 1}. {g['name']} (v{g['version']})\n"
-                store_menu += f"{len(games_list) + 1}. Logout"
 
-                valid_store_inputs = [str(i) for i in range(1, len(games_list) + 2)]
+                # Navigation entries follow the games; Logout is always last
+                nav = []
+                if has_next:
+                    nav.append(("next", "Next Page"))
+                if store_offset:
+                    nav.append(("prev", "Previous Page"))
+                nav.append(("logout", "Logout"))
+                for idx, (_, label) in enumerate(nav, len(games_list) + 1):
+                    store_menu += f"{idx}. {label}\n"
+                store_menu = store_menu.rstrip("\n")
+
+                valid_store_inputs = [str(i) for i in range(1, len(games_list) + len(nav) + 1)]
                 
-                resp = client_interaction(sock, store_menu, valid_store_inputs)
+                resp = await client_interaction(conn, store_menu, valid_store_inputs)
                 if not resp: break
                 
                 store_choice = int(resp.get("response"))
 
-                if store_choice == len(games_list) + 1:
-                    send_db_request({"op": "update player status", "name": name, "status": "offline"})
-                    name = None
-                    print(f"[Server] Logged out.")
+                if store_choice > len(games_list):
+                    action = nav[store_choice - len(games_list) - 1][0]
+                    if action == "next":
+                        store_offset += STORE_PAGE_SIZE
+                    elif action == "prev":
+                        store_offset = max(0, store_offset - STORE_PAGE_SIZE)
+                    else:
+                        await send_db_request({"op": "update player status", "name": name, "status": "offline"})
+                        name = None
+                        session = None
+                        store_offset = 0
+                        print(f"[Server] Logged out.")
                     continue 
 
                 selected_game = games_list[store_choice - 1]
@@ -423,94 +1030,83 @@ def handle_client(sock):
 
                 # --- Inner Loop: Specific Game Actions ---
                 while True:
-                    p_req = {"op": "query player", "criteria": {"name": name}}
-                    p_data = send_db_request(p_req).get("data")[0]
-                    g_req = {"op": "query game", "criteria": {"name": game_name}}
-                    selected_game = send_db_request(g_req).get("data")[0]
-                    
-                    library = p_data.get("games", {}) 
-                    is_owned = game_name in dict(library)
-                    client_game_version = dict(library).get(game_name, 0)
+                    is_owned = game_name in session.library
+                    client_game_version = session.library.get(game_name, 0)
 
                     sub_text = f"--- {game_name} ---\n1. Details\n2. Play"
                     sub_opts = ["1", "2"]
                     if is_owned:
                         sub_text += "\n3. Review"
                         sub_opts.append("3")
+
+                    reviews_idx = len(sub_opts) + 1
+                    sub_text += f"\n{reviews_idx}. All Reviews"
+                    sub_opts.append(str(reviews_idx))
                     
                     back_idx = len(sub_opts) + 1
                     sub_text += f"\n{back_idx}. Back"
                     sub_opts.append(str(back_idx))
 
-                    g_resp = client_interaction(sock, sub_text, sub_opts)
+                    g_resp = await client_interaction(conn, sub_text, sub_opts)
                     if not g_resp: break
                     g_choice = g_resp.get("response")
 
                     if g_choice == str(back_idx):
                         break 
 
+                    if g_choice == str(reviews_idx):
+                        await show_reviews(conn, game_name)
+                        continue
+
                     if g_choice == "1":
+                        record = await session.game_record(game_name)
+                        if not record:
+                            await client_interaction(conn, "Error: Game not found.", "none")
+                            continue
+
                         def get_description(data):
                             if not data: return "No description"
                             return "\n====\n" + data + "\n===="
-                        def get_feedback(data):
-                            if not data: return "No feedback"
-                            ret = "\n====\n"
-                            for i in data:
-                                ret += f"User {i[0]} ({i[1]} stars): {i[2]}\n"
-                            return ret + "===="
-
-                        desc = f"Name: {selected_game['name']}\n" \
-                               f"Version: {selected_game['version']}\n" \
-                               f"Players: {selected_game['players']}\n" \
-                               f"Description: {get_description(selected_game.get('description'))}\n" \
-                               f"Feedback: {get_feedback(selected_game.get('feedback'))}"
-                        client_interaction(sock, desc, "none")
+
+                        desc = f"Name: {record['name']}\n" \
+                               f"Version: {record['version']}\n" \
+                               f"Players: {record['players']}\n" \
+                               f"Rating: {format_rating(record)}\n" \
+                               f"Description: {get_description(record.get('description'))}\n" \
+                               f"Recent Feedback: {format_feedback(record.get('recent_feedback'))}"
+                        await client_interaction(conn, desc, "none")
 
                     elif g_choice == "2": # PLAY
-                        need_download = False
+                        need_update = False
                         if not is_owned:
-                            client_interaction(sock, "You don't own this game. Downloading...", "none")
-                            need_download = True
+                            await client_interaction(conn, "You don't own this game. Downloading...", "none")
+                            need_update = True
                         elif client_game_version < server_game_version:
-                            client_interaction(sock, f"Update available. Updating...", "none")
-                            need_download = True
-                        
-                        if need_download:
-                            code_content = read_game_file(game_name)
-                            if not code_content:
-                                client_interaction(sock, "Error: Game file missing on server.", "none")
-                                continue
-
-                            save_path = os.path.join("games", name, game_name, "client.py")
-                            save_msg = {"op": "save", "path": save_path, "file data": code_content}
-                            netutils.send_msg(sock, save_msg)
-
-                            action = "add game" if not is_owned else "update version"
-                            upd_req = {
-                                "op": "update player games",
-                                "name": name,
-                                "action": action,
-                                "payload": [game_name, server_game_version]
-                            }
-                            send_db_request(upd_req)
-                            client_interaction(sock, "Download Complete!", "none")
+                            await client_interaction(conn, f"Update available. Updating...", "none")
+                            need_update = True
+
+                        # Also repairs a missing or modified local copy of an owned game
+                        sent = await sync_game_files(conn, name, game_name, server_game_version)
+                        if sent is None:
+                            continue
+
+                        if need_update:
+                            await session.set_game_version(game_name, server_game_version)
+                        if need_update or sent:
+                            await client_interaction(conn, "Download Complete!", "none")
                         
                         # --- ENTER GAME LOBBY ---
-                        handle_game_lobby(sock, name, game_name, game_player_limit)
+                        await handle_game_lobby(conn, name, game_name, server_game_version, game_player_limit)
 
                     elif g_choice == "3" and is_owned:
-                        s_resp = client_interaction(sock, "Rate (1-5):", ["1", "2", "3", "4", "5"])
+                        s_resp = await client_interaction(conn, "Rate (1-5):", ["1", "2", "3", "4", "5"])
                         stars = int(s_resp.get("response"))
-                        c_resp = client_interaction(sock, "Write a short review:", ["text", 100])
+                        c_resp = await client_interaction(conn, "Write a short review:", ["text", 100])
                         comment = c_resp.get("response")
-                        fb_req = {
-                            "op": "add feedback",
-                            "name": game_name,
-                            "feedback": [name, stars, comment]
-                        }
-                        send_db_request(fb_req)
-                        client_interaction(sock, "Review submitted.", "none")
+                        await session.add_feedback(game_name, stars, comment)
+                        await client_interaction(conn, "Review submitted.", "none")
+
+                session.forget_game(game_name)
 
     except (ConnectionResetError, BrokenPipeError):
         print(f"[Server] Connection lost with {name if name else 'client'}")
@@ -520,34 +1116,70 @@ def handle_client(sock):
         traceback.print_exc()
     finally:
         if name:
-            try: send_db_request({"op": "update player status", "name": name, "status": "offline"})
+            try: await send_db_request({"op": "update player status", "name": name, "status": "offline"})
             except: pass
-        sock.close()
+        totals = netutils.stats(writer)
+        print(f"[Server] Closed connection with {name if name else 'client'}: "
+              f"sent {totals['sent']} bytes ({totals['sent_wire']} on the wire), "
+              f"received {totals['received']} bytes ({totals['received_wire']} on the wire)")
+        writer.close()
 
 # -----------------------------------------------------------------------------
 # Server Startup
 # -----------------------------------------------------------------------------
 
+def raise_fd_limit():
+    """
+    Lifts the soft open-files limit to the hard limit, so the server can hold
+    many more idle sessions than the usual default of 1024 descriptors.
+    """
+    try:
+        import resource
+    except ImportError:
+        return  # Windows
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+async def log_stats():
+    """Background task: logs the DB pool and Quick Play statistics every STATS_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(constants.STATS_INTERVAL)
+        print(f"[Server] DB pool stats: {db_pool.stats()}")
+        print(f"[Server] Quick Play stats: {quick_play.stats()}")
+
+async def serve():
+    server = await asyncio.start_server(
+        handle_client, '0.0.0.0', constants.PLAY_PORT,
+        backlog=constants.PLAY_BACKLOG, reuse_address=True
+    )
+    print(f"[Server] Player Server listening on {('0.0.0.0', constants.PLAY_PORT)}")
+    watcher = asyncio.create_task(catalog.watch())
+    stats_logger = asyncio.create_task(log_stats())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+        stats_logger.cancel()
+
 def start_server():
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    bind_addr = ('0.0.0.0', constants.PLAY_PORT)
-    server.bind(bind_addr)
-    server.listen(5)
-    
-    print(f"[Server] Player Server listening on {bind_addr}")
+    global game_runner, game_host
+    raise_fd_limit()
+    game_runner = gamerunner.GameRunner(constants.GAME_WORKERS)
+    game_host = gamehost.GameHostProcess('0.0.0.0', constants.GAME_HOST_PORT)
+    game_host.start()
 
     try:
-        while True:
-            client_sock, addr = server.accept()
-            t = threading.Thread(target=handle_client, args=(client_sock,))
-            t.daemon = True
-            t.start()
+        asyncio.run(serve())
     except KeyboardInterrupt:
         print("\n[Server] Shutting down...")
     finally:
-        server.close()
+        game_runner.close()
+        game_host.close()
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    start_server()
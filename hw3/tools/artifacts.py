@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from tools import netutils
+
+# Relative to the server's working directory, next to the legacy games/<name>/ folders
+DEFAULT_ROOT = os.path.join("games", ".store")
+
+# Blobs up to this size are kept in memory after the first read
+CACHE_BLOB_LIMIT = 1024 * 1024
+CACHE_TOTAL_LIMIT = 32 * 1024 * 1024
+
+class ArtifactStore:
+    """
+    Content-addressed, versioned storage for uploaded game files.
+
+    Layout under `root`:
+        blobs/<sha[:2]>/<sha>              file contents keyed by SHA-256, never modified
+        manifests/<game>/<version>.json    {"game", "version", "files": {filename: sha}},
+                                           written once and never replaced
+        versions/<game>/<version>-<hash>/  hard links to the blobs under their real
+                                           file names, used to run a game server;
+                                           <hash> identifies the manifest's file list
+
+    Publishing a new version only adds files, so servers of older versions
+    keep running from their own directory, and unchanged files are stored once.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, legacy_root="games"):
+        self.root = root
+        self.legacy_root = legacy_root
+        self._cache = OrderedDict()   # LRU: {sha: bytes}
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Paths
+    # -------------------------------------------------------------------------
+
+    def blob_path(self, sha):
+        return os.path.join(self.root, "blobs", sha[:2], sha)
+
+    def _manifest_path(self, game, version):
+        return os.path.join(self.root, "manifests", game, f"{version}.json")
+
+    def _tmp_dir(self):
+        path = os.path.join(self.root, "tmp")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+
+    def put_file(self, path):
+        """
+        Adds a file's contents to the store and returns its SHA-256.
+        Identical contents are stored only once.
+        """
+        sha = netutils.file_sha256(path)
+        if sha is None:
+            raise FileNotFoundError(f"No such file: {path}")
+        target = self.blob_path(sha)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+            os.close(fd)
+            shutil.copyfile(path, tmp_path)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, target)
+        return sha
+
+    def publish(self, game, version, files):
+        """
+        Stores `files` ({filename: local path}) as `version` of `game`.
+        The manifest is written last and atomically, so a version is either
+        complete or not visible at all. Returns the manifest.
+        A published version is never replaced: raises FileExistsError if
+        `version` already exists with different files.
+        """
+        manifest = {
+            "game": game,
+            "version": version,
+            "files": {name: self.put_file(path) for name, path in files.items()},
+        }
+
+        target = self._manifest_path(game, version)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        try:
+            # Unlike a rename, a link never replaces an existing manifest
+            os.link(tmp_path, target)
+        except FileExistsError:
+            existing = self.manifest(game, version)
+            if existing is None or existing["files"] != manifest["files"]:
+                raise FileExistsError(f"{game} v{version} is already published")
+            return existing
+        finally:
+            os.remove(tmp_path)
+        return manifest
+
+    def publish_next(self, game, after_version, files):
+        """
+        Publishes `files` as the first unused version of `game` above
+        `after_version` and returns that version. Creating the manifest is
+        what claims a version, so concurrent uploads never share one.
+        """
+        version = after_version + 1
+        while True:
+            try:
+                self.publish(game, version, files)
+                return version
+            except FileExistsError:
+                version += 1
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    def manifest(self, game, version):
+        """Returns the manifest of a game version, or None if it does not exist."""
+        try:
+            with open(self._manifest_path(game, version)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def import_legacy(self, game, current_version):
+        """
+        Imports a game uploaded before the store existed (games/<name>/) as
+        `current_version`, which must be the game's current version in the DB.
+        Happens at most once: a game with any published version is never
+        imported again. Returns the manifest, or None if nothing was imported.
+        """
+        try:
+            if os.listdir(os.path.join(self.root, "manifests", game)):
+                return None
+        except FileNotFoundError:
+            pass
+
+        legacy_dir = os.path.join(self.legacy_root, game)
+        if not os.path.isdir(legacy_dir):
+            return None
+        files = {
+            name: os.path.join(legacy_dir, name)
+            for name in os.listdir(legacy_dir)
+            if os.path.isfile(os.path.join(legacy_dir, name))
+        }
+        if not files:
+            return None
+        try:
+            return self.publish(game, current_version, files)
+        except FileExistsError:
+            return None  # Imported or published concurrently with other files
+
+    def file_path(self, game, version, filename):
+        """Returns the blob path of one file of a game version, or None."""
+        manifest = self.manifest(game, version)
+        if not manifest or filename not in manifest["files"]:
+            return None
+        return self.blob_path(manifest["files"][filename])
+
+    def blob_source(self, sha):
+        """
+        Returns something netutils.send_file() can stream: the contents from
+        the memory cache for small blobs, otherwise the blob's path on disk.
+        """
+        if os.path.getsize(self.blob_path(sha)) <= CACHE_BLOB_LIMIT:
+            return self.read_blob(sha)
+        return self.blob_path(sha)
+
+    def read_blob(self, sha):
+        """
+        Returns a blob's contents. Blobs never change, so small ones are
+        cached in memory without any invalidation.
+        """
+        with self._lock:
+            data = self._cache.get(sha)
+            if data is not None:
+                self._cache.move_to_end(sha)
+                return data
+
+        with open(self.blob_path(sha), "rb") as f:
+            data = f.read()
+
+        if len(data) <= CACHE_BLOB_LIMIT:
+            with self._lock:
+                if sha not in self._cache:
+                    self._cache[sha] = data
+                    self._cache_bytes += len(data)
+                    while self._cache_bytes > CACHE_TOTAL_LIMIT:
+                        _, evicted = self._cache.popitem(last=False)
+                        self._cache_bytes -= len(evicted)
+        return data
+
+    def checkout(self, game, version):
+        """
+        Returns a directory holding every file of a game version under its
+        real name (e.g. server.py), building it on first use. The directory
+        is never modified afterwards, so a running game server is unaffected
+        by newer versions being published. It is named after the manifest's
+        file list, so it always holds exactly the files the manifest lists.
+        """
+        manifest = self.manifest(game, version)
+        if not manifest:
+            return None
+
+        files_id = hashlib.sha256(json.dumps(manifest["files"], sort_keys=True).encode()).hexdigest()[:16]
+        target = os.path.join(self.root, "versions", game, f"{version}-{files_id}")
+        if os.path.isdir(target):
+            return target
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        build_dir = tempfile.mkdtemp(dir=self._tmp_dir())
+        for name, sha in manifest["files"].items():
+            try:
+                os.link(self.blob_path(sha), os.path.join(build_dir, name))
+            except OSError:
+                shutil.copyfile(self.blob_path(sha), os.path.join(build_dir, name))
+
+        try:
+            os.rename(build_dir, target)
+        except OSError:
+            # Another process built it first
+            shutil.rmtree(build_dir, ignore_errors=True)
+        return target
@@ -1,11 +1,34 @@
 DB_HOST = '127.0.0.1'
 DB_PORT = 16200
+DB_BACKLOG = 128
+DB_READERS = 4
+# Applied to every sqlite connection of database.py, in this order
+DB_PRAGMAS = {
+    "journal_mode": "WAL",       # Readers never block the writer (persistent, set by the writer)
+    "synchronous": "NORMAL",     # In WAL mode: fsync at checkpoints, not on every commit
+    "cache_size": -16384,        # Page cache per connection, in KiB when negative (16 MiB)
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,        # ms to wait for a lock before failing with "database is locked"
+}
 
 PLAY_HOST = '127.0.0.1'
 PLAY_PORT = 16202
+PLAY_BACKLOG = 128
 
 DEV_HOST = '127.0.0.1'
 DEV_PORT = 16201
+DEV_BACKLOG = 128
 
 GAME_PORT_L = 16210
-GAME_PORT_R = 16230
\ No newline at end of file
+GAME_PORT_R = 16230
+GAME_WORKERS = 2
+GAME_HOST_PORT = 16203
+
+DB_POOL_SIZE = 8
+
+# Seconds between the statistics log lines of the developer and player servers
+STATS_INTERVAL = 60
+
+# Reviews kept with each game (newest first) and shown on its Details screen
+RECENT_FEEDBACK = 5
\ No newline at end of file
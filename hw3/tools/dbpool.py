@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+from tools import netutils
+
+class AsyncDBPool:
+    """
+    Pool of long-lived, framed connections to the database server, for
+    servers running on an event loop. Must be used from a single event loop.
+
+    Connections are checked out for one request/response exchange and checked
+    back in afterwards, so the DB server keeps one handler (and one sqlite
+    connection) per pooled connection instead of one per request.
+    """
+
+    def __init__(self, host, port, size=8, connect_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.connect_timeout = connect_timeout
+
+        self._idle = []                             # LIFO stack of idle (reader, writer) pairs
+        self._slots = asyncio.Semaphore(size)
+
+        self._stats = {
+            "connects": 0,      # connections opened (including reconnects)
+            "stale": 0,         # idle connections found closed by the server at checkout
+            "reconnects": 0,    # retries after a send failed on a reused connection
+            "failures": 0,      # requests that failed (never resent once written)
+            "checkouts": 0,
+            "waits": 0,         # checkouts that had to wait for a free slot
+            "wait_time": 0.0,   # total seconds spent waiting for a slot
+            "in_use": 0,
+        }
+
+    # -------------------------------------------------------------------------
+    # Connection Management
+    # -------------------------------------------------------------------------
+
+    async def _connect(self):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.connect_timeout
+        )
+        try:
+            await asyncio.wait_for(netutils.async_negotiate(reader, writer), self.connect_timeout)
+        except Exception:
+            writer.close()
+            raise
+        self._stats["connects"] += 1
+        return reader, writer
+
+    async def checkout(self):
+        """
+        Returns an open (reader, writer) pair, waiting for a free slot if all
+        `size` connections are in use. Must be paired with checkin().
+        """
+        return (await self._checkout())[0]
+
+    async def _checkout(self):
+        """checkout(), also telling whether the connection was reused from the idle stack."""
+        if self._slots.locked():
+            start = time.monotonic()
+            await self._slots.acquire()
+            self._stats["waits"] += 1
+            self._stats["wait_time"] += time.monotonic() - start
+        else:
+            await self._slots.acquire()
+
+        self._stats["checkouts"] += 1
+        self._stats["in_use"] += 1
+        while self._idle:
+            reader, writer = conn = self._idle.pop()
+            # The loop has already seen the EOF of a connection the server closed
+            if not (reader.at_eof() or writer.is_closing()):
+                return conn, True
+            writer.close()
+            self._stats["stale"] += 1
+
+        try:
+            return await self._connect(), False
+        except BaseException:
+            self._release_slot()
+            raise
+
+    def checkin(self, conn, broken=False):
+        """
+        Returns a connection to the pool. Broken connections are closed and
+        will be replaced lazily on the next checkout.
+        """
+        if broken:
+            conn[1].close()
+        else:
+            self._idle.append(conn)
+        self._release_slot()
+
+    def _release_slot(self):
+        self._stats["in_use"] -= 1
+        self._slots.release()
+
+    def close(self):
+        """Closes every idle connection."""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+
+    async def request(self, request_dict):
+        """
+        Sends one request and returns the response. Pooled connections the
+        DB server has closed (e.g. it restarted) are replaced at checkout,
+        and if sending on a reused connection still fails, the request is
+        sent again on a fresh one. Once a request has been sent it is never
+        resent, since most requests are not safe to apply twice: a lost
+        response raises instead.
+        """
+        while True:
+            conn, reused = await self._checkout()
+            try:
+                await netutils.async_send_msg(conn[1], request_dict)
+            except OSError as e:
+                self.checkin(conn, broken=True)
+                if reused:
+                    # The other idle connections most likely died with this one
+                    self.close()
+                    self._stats["reconnects"] += 1
+                    continue
+                self._stats["failures"] += 1
+                raise e
+            except BaseException:
+                self.checkin(conn, broken=True)
+                raise
+
+            try:
+                response = await netutils.async_recv_msg(conn[0])
+                if response is None:
+                    raise ConnectionError("DB server closed the connection")
+            except (OSError, ValueError) as e:
+                self.checkin(conn, broken=True)
+                self._stats["failures"] += 1
+                raise e
+            except BaseException:
+                # Cancelled mid-request: the response may still arrive, so drop the connection
+                self.checkin(conn, broken=True)
+                raise
+            self.checkin(conn)
+            return response
+
+    def stats(self):
+        """Returns a snapshot of the pool statistics."""
+        snapshot = dict(self._stats)
+        snapshot["idle"] = len(self._idle)
+        snapshot["size"] = self.size
+        return snapshot
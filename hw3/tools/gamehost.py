@@ -0,0 +1,431 @@
+import ast
+import asyncio
+import hmac
+import importlib.util
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import traceback
+
+if __name__ == "__main__":
+    # Started as the host process: sys.path[0] is this file's directory, the project root is one level up
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import netutils
+
+# Control connections must present this secret (set by the player server)
+SECRET_ENV = "NETPROG_HOST_SECRET"
+
+# Players must send their join frame within this many seconds of connecting
+JOIN_TIMEOUT = 10
+
+# A hosted game's server.py must import within this many seconds (below the
+# player server's 5 second wait for the host's reply)
+LOAD_TIMEOUT = 3
+
+# -----------------------------------------------------------------------------
+# Hosted Game API
+# -----------------------------------------------------------------------------
+
+class HostedGame:
+    """
+    Base class for games that can run inside the shared game host, where one
+    process and one port serve many rooms. A game's server.py opts in by
+    defining `HOSTED_GAME = <subclass>`.
+
+    One instance is created per room. The hooks run on the host's event loop,
+    so they must not block (no input(), sleep() or blocking socket calls):
+        on_join(player)            a player connected (player.seat: 0, 1, ...)
+        on_message(player, msg)    a player sent a message (a dict)
+        on_leave(player)           a player disconnected before the room closed
+    Use player.send(msg), self.room.broadcast(msg) and self.room.close().
+    """
+
+    def __init__(self, room):
+        self.room = room
+
+    def on_join(self, player):
+        pass
+
+    def on_message(self, player, msg):
+        pass
+
+    def on_leave(self, player):
+        pass
+
+class Player:
+    """One connected player of a room."""
+
+    def __init__(self, seat, writer):
+        self.seat = seat          # Join order, starting at 0
+        self.connected = True
+        self._writer = writer
+
+    def send(self, message):
+        """Queues a message to this player (never blocks)."""
+        if self.connected and not self._writer.is_closing():
+            self._writer.writelines(netutils.encode_frame(netutils.get_session(self._writer), message))
+
+    def close(self):
+        self.connected = False
+        self._writer.close()
+
+class Room:
+    """
+    One match: its game instance and the players that joined it.
+    A room closes when the game calls close() or every player has left.
+    """
+
+    def __init__(self, token, game_class, player_limit):
+        self.token = token
+        self.player_limit = player_limit
+        self.players = []         # Indexed by seat, including players that left
+        self.closed = False
+        self._closed_event = asyncio.Event()
+        self.game = game_class(self)
+
+    def is_full(self):
+        return len(self.players) >= self.player_limit
+
+    def broadcast(self, message, exclude=None):
+        """Sends a message to every connected player, except `exclude`."""
+        for player in self.players:
+            if player is not exclude:
+                player.send(message)
+
+    def close(self):
+        """Ends the match and disconnects every player."""
+        if self.closed:
+            return
+        self.closed = True
+        for player in self.players:
+            player.close()
+        self._closed_event.set()
+
+    async def wait_closed(self):
+        await self._closed_event.wait()
+
+    def dispatch(self, hook, *args):
+        """Calls a game hook. A failing game only takes its own room down."""
+        try:
+            getattr(self.game, hook)(*args)
+        except Exception:
+            print(f"[GameHost] Room {self.token}: {hook} failed")
+            traceback.print_exc()
+            self.close()
+
+async def serve_player(room, reader, writer):
+    """Feeds one player's connection into a room until either one closes."""
+    if room.closed or room.is_full():
+        writer.close()
+        return
+
+    player = Player(len(room.players), writer)
+    room.players.append(player)
+    room.dispatch("on_join", player)
+
+    try:
+        while not room.closed:
+            try:
+                msg = await netutils.async_recv_msg(reader)
+            except ValueError:
+                msg = None  # Malformed frame: treat as a disconnect
+            if msg is None:
+                break
+            if isinstance(msg, dict) and msg.get("op") == "join":
+                continue  # Room token sent to a standalone server
+            room.dispatch("on_message", player, msg)
+    finally:
+        if not room.closed:
+            player.connected = False
+            room.dispatch("on_leave", player)
+            if not any(p.connected for p in room.players):
+                room.close()
+        writer.close()
+
+def run_standalone(game_class, host, port, player_limit):
+    """
+    Runs a single room of a hosted game on its own port. This is what
+    `server.py <host> <port>` does for a hosted game, so it still works when
+    started as its own process (or by hand while developing it).
+    """
+    async def serve():
+        room = Room(None, game_class, player_limit)
+        listener = netutils.listen(host, port, player_limit)
+        server = await asyncio.start_server(lambda r, w: serve_player(room, r, w), sock=listener)
+        print(f"Server listening on {host}:{port}...")
+        async with server:
+            await room.wait_closed()
+
+    asyncio.run(serve())
+
+# -----------------------------------------------------------------------------
+# Host Process
+# -----------------------------------------------------------------------------
+# Every connection starts with one frame:
+#   players:   {"op": "join", "room": token}
+#   control:   {"op": "open room", "secret": s, "script": path to server.py, "players": n}
+#              -> {"status": "success", "room": token} | {"status": "error", "message": ...}
+#              -> {"op": "room closed"} once the match is over
+# Closing the control connection closes its room.
+#
+# A server.py is only imported into the host if it assigns HOSTED_GAME at its
+# top level, and only after a throwaway process imported it within
+# LOAD_TIMEOUT. Any other script never runs here, so blocking or exiting
+# top-level code cannot stall or kill the rooms already being hosted.
+
+# Run as `python -c _CHECK_SCRIPT <project root> <script>`: exits with 0 if
+# the script imports and its HOSTED_GAME is a HostedGame subclass
+_CHECK_SCRIPT = """
+import importlib.util, sys
+sys.path.insert(0, sys.argv[1])
+from tools import gamehost
+spec = importlib.util.spec_from_file_location("hosted_game", sys.argv[2])
+module = importlib.util.module_from_spec(spec)
+try:
+    spec.loader.exec_module(module)
+except SystemExit:
+    sys.exit(1)
+game_class = getattr(module, "HOSTED_GAME", None)
+sys.exit(0 if isinstance(game_class, type) and issubclass(game_class, gamehost.HostedGame) else 1)
+"""
+
+def declares_hosted_game(source):
+    """Returns True if a server.py's source assigns HOSTED_GAME at its top level (without running it)."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return False
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            continue
+        if any(isinstance(t, ast.Name) and t.id == "HOSTED_GAME" for t in targets):
+            return True
+    return False
+
+class GameHost:
+    def __init__(self, secret):
+        self.secret = secret
+        self.rooms = {}           # Format: {token: Room}
+        self._classes = {}        # Format: {script path: task returning the HOSTED_GAME class or None}
+
+    async def load_game(self, script):
+        """
+        Returns the HOSTED_GAME class of a server.py, or None if it has none.
+        Version directories never change, so each script is loaded once.
+        """
+        if script not in self._classes:
+            self._classes[script] = asyncio.ensure_future(self._load_game(script))
+        # Shielded: a control connection giving up must not cancel a shared load
+        return await asyncio.shield(self._classes[script])
+
+    async def _load_game(self, script):
+        try:
+            with open(script, "rb") as f:
+                source = f.read()
+        except OSError as e:
+            print(f"[GameHost] Failed to read {script}: {e}")
+            return None
+        if not declares_hosted_game(source):
+            return None
+
+        # Import it in a throwaway process first: it must neither block nor exit
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            checker = await asyncio.create_subprocess_exec(
+                sys.executable, "-c", _CHECK_SCRIPT, root, script,
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL
+            )
+        except OSError as e:
+            print(f"[GameHost] Failed to check {script}: {e}")
+            return None
+        try:
+            returncode = await asyncio.wait_for(checker.wait(), LOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            checker.kill()
+            await checker.wait()
+            print(f"[GameHost] {script} took over {LOAD_TIMEOUT}s to import, not hosting it")
+            return None
+        if returncode != 0:
+            print(f"[GameHost] {script} has no usable HOSTED_GAME, not hosting it")
+            return None
+
+        try:
+            spec = importlib.util.spec_from_file_location(f"hosted_game_{len(self._classes)}", script)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return getattr(module, "HOSTED_GAME", None)
+        except (Exception, SystemExit):
+            print(f"[GameHost] Failed to load {script}")
+            traceback.print_exc()
+            return None
+
+    async def handle_connection(self, reader, writer):
+        try:
+            first = await asyncio.wait_for(netutils.async_recv_msg(reader), JOIN_TIMEOUT)
+        except (asyncio.TimeoutError, ValueError):
+            first = None
+
+        if not isinstance(first, dict):
+            writer.close()
+        elif first.get("op") == "join":
+            room = self.rooms.get(first.get("room"))
+            if room is None:
+                await netutils.async_send_msg(writer, {"status": "error", "message": "Unknown room"})
+                writer.close()
+            else:
+                await serve_player(room, reader, writer)
+        elif first.get("op") == "open room":
+            await self.control(first, reader, writer)
+        else:
+            writer.close()
+
+    async def control(self, request, reader, writer):
+        if not hmac.compare_digest(str(request.get("secret", "")), self.secret):
+            writer.close()
+            return
+
+        game_class = await self.load_game(str(request.get("script", "")))
+        if game_class is None:
+            await netutils.async_send_msg(writer, {"status": "error", "message": "Not a hosted game"})
+            writer.close()
+            return
+
+        token = secrets.token_urlsafe(12)
+        try:
+            room = Room(token, game_class, int(request.get("players", 2)))
+        except Exception as e:
+            traceback.print_exc()
+            await netutils.async_send_msg(writer, {"status": "error", "message": f"Game failed to start: {e}"})
+            writer.close()
+            return
+
+        self.rooms[token] = room
+        print(f"[GameHost] Opened room {token} ({len(self.rooms)} open)")
+        try:
+            await netutils.async_send_msg(writer, {"status": "success", "room": token})
+
+            # Wait for the match to end, or for the player server to give up on it
+            closed = asyncio.ensure_future(room.wait_closed())
+            dropped = asyncio.ensure_future(reader.read())
+            await asyncio.wait({closed, dropped}, return_when=asyncio.FIRST_COMPLETED)
+            closed.cancel()
+            dropped.cancel()
+            room.close()
+            await netutils.async_send_msg(writer, {"op": "room closed"})
+        except ConnectionError:
+            room.close()
+        finally:
+            del self.rooms[token]
+            print(f"[GameHost] Closed room {token} ({len(self.rooms)} open)")
+            writer.close()
+
+    async def serve(self, host, port):
+        listener = netutils.listen(host, port, 128)
+        server = await asyncio.start_server(self.handle_connection, sock=listener)
+        print(f"[GameHost] Hosting games on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    host, port = sys.argv[1], int(sys.argv[2])
+    try:
+        asyncio.run(GameHost(os.environ[SECRET_ENV]).serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+# -----------------------------------------------------------------------------
+# Player Server Side
+# -----------------------------------------------------------------------------
+
+class HostedRoom:
+    """A room opened in the game host; `await wait()` returns once the match is over."""
+
+    def __init__(self, reader, writer, token):
+        self.reader = reader
+        self.writer = writer
+        self.token = token
+
+    async def wait(self):
+        try:
+            await netutils.async_recv_msg(self.reader)
+        finally:
+            self.writer.close()
+
+class GameHostProcess:
+    """
+    Runs the game host as a child process of the player server and opens
+    rooms in it. The listening socket is bound here and inherited where
+    possible, so the host accepts connections from the moment it starts.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.secret = secrets.token_hex(16)
+        self.process = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the host process, or restarts it if it died."""
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                return
+
+            env = dict(os.environ, **{SECRET_ENV: self.secret})
+            args = [sys.executable, os.path.abspath(__file__), self.host, str(self.port)]
+            if os.name == "posix":
+                listener = netutils.listen(self.host, self.port, 128)
+                try:
+                    env[netutils.LISTEN_FD_ENV] = str(listener.fileno())
+                    self.process = subprocess.Popen(args, env=env, pass_fds=[listener.fileno()])
+                finally:
+                    listener.close()
+            else:
+                self.process = subprocess.Popen(args, env=env)
+
+    async def open_room(self, script, player_limit):
+        """
+        Opens a room for the game at `script` (its server.py).
+        Returns a HostedRoom, or None if the game has no hosted version
+        or the host cannot be reached.
+        """
+        try:
+            self.start()
+            reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", self.port), 5)
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"[GameHost] Unavailable: {e}")
+            return None
+
+        try:
+            await netutils.async_send_msg(writer, {
+                "op": "open room",
+                "secret": self.secret,
+                "script": os.path.abspath(script),
+                "players": player_limit
+            })
+            reply = await asyncio.wait_for(netutils.async_recv_msg(reader), 5)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            print(f"[GameHost] Failed to open room: {e}")
+            reply = None
+
+        if not reply or reply.get("status") != "success":
+            writer.close()
+            return None
+        return HostedRoom(reader, writer, reply["room"])
+
+    def close(self):
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                self.process.terminate()
+
+if __name__ == "__main__":
+    # Go through the package, so games importing tools.gamehost share these classes
+    from tools import gamehost
+    gamehost.main()
@@ -0,0 +1,221 @@
+import collections
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+if __name__ == "__main__":
+    # Started as a worker: sys.path[0] is this file's directory, the project root is one level up
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import netutils
+
+# Warm workers are only possible where file descriptors can be passed over a
+# Unix socket; elsewhere every game server is started cold.
+WARM_WORKERS_SUPPORTED = hasattr(socket, "send_fds") and hasattr(socket, "AF_UNIX")
+
+# Cold starts hand the listening socket down by fd inheritance (POSIX only)
+FD_INHERITANCE_SUPPORTED = os.name == "posix"
+
+LISTEN_BACKLOG = 16
+MAX_JOB_SIZE = 64 * 1024
+
+# -----------------------------------------------------------------------------
+# Parent Side
+# -----------------------------------------------------------------------------
+
+class PortAllocator:
+    """
+    Hands out game ports from [low, high) as sockets that are already bound
+    and listening, so no other room or program can take a port between
+    choosing it and the game server starting. Released ports go to the back
+    of the free-list, so a port is not reused right after its game ends.
+    """
+
+    def __init__(self, host, low, high, backlog=LISTEN_BACKLOG):
+        self.host = host
+        self.backlog = backlog
+        self._free = collections.deque(range(low, high))
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Returns (port, listening socket), or None if every port is taken."""
+        with self._lock:
+            for _ in range(len(self._free)):
+                port = self._free.popleft()
+                try:
+                    return port, netutils.listen(self.host, port, self.backlog)
+                except OSError:
+                    # Used by another program; try it again later
+                    self._free.append(port)
+        return None
+
+    def release(self, port):
+        """Returns a port once the game server that used it has exited."""
+        with self._lock:
+            self._free.append(port)
+
+class GameRunner:
+    """
+    Starts game servers (`server.py <host> <port>`) from a pool of warm
+    Python workers.
+
+    A worker is an interpreter that has already started up and imported
+    tools.netutils. It idles until it is sent a job: the game script to run
+    and the game's listening socket (from PortAllocator). Clients can connect
+    as soon as start() returns, and their connections wait in the backlog
+    until the game calls accept(). Each worker runs exactly one game and
+    then exits, and a new one is started in its place.
+
+    If no worker is available the game is started cold, inheriting the
+    listening socket. Windows can do neither, so there the port is
+    released and the game binds it itself, as before.
+    """
+
+    def __init__(self, size=2):
+        self.size = size if WARM_WORKERS_SUPPORTED else 0
+        self._idle = []       # Format: [(Popen, control socket)]
+        self._lock = threading.Lock()
+        self._closed = False
+
+        with self._lock:
+            for _ in range(self.size):
+                self._spawn()
+
+    def _spawn(self):
+        """Starts one idle worker. Caller holds the lock."""
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(child_end.fileno())],
+                pass_fds=[child_end.fileno()]
+            )
+        except OSError as e:
+            print(f"[GameRunner] Failed to start worker: {e}")
+            parent_end.close()
+            return
+        finally:
+            child_end.close()
+        self._idle.append((process, parent_end))
+
+    def start(self, script, listener):
+        """
+        Runs `script` as `script <host> <port>` on the address `listener` is
+        bound to and returns its Popen object. The runner takes ownership of
+        `listener` and closes this process' copy of it.
+        """
+        host, port = listener.getsockname()[:2]
+        argv = [host, str(port)]
+        try:
+            job = json.dumps({"script": os.path.abspath(script), "argv": argv}).encode()
+            with self._lock:
+                while self._idle:
+                    process, control = self._idle.pop(0)
+                    try:
+                        socket.send_fds(control, [job], [listener.fileno()])
+                    except OSError:
+                        # Worker died while idle; try the next one
+                        control.close()
+                        process.poll()
+                        continue
+                    control.close()
+                    # Replace the worker off the critical path
+                    threading.Thread(target=self._replenish, daemon=True).start()
+                    return process
+
+            if not FD_INHERITANCE_SUPPORTED:
+                listener.close()
+                return subprocess.Popen([sys.executable, script] + argv)
+
+            if self.size:
+                print("[GameRunner] No warm worker available, starting cold")
+            fd = listener.fileno()
+            env = dict(os.environ, **{netutils.LISTEN_FD_ENV: str(fd)})
+            return subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--run", os.path.abspath(script)] + argv,
+                pass_fds=[fd], env=env
+            )
+        finally:
+            listener.close()
+
+    def _replenish(self):
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._spawn()
+
+    def close(self):
+        """Stops every idle worker (they exit when their control socket closes)."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for process, control in idle:
+            control.close()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+# -----------------------------------------------------------------------------
+# Worker Side
+# -----------------------------------------------------------------------------
+
+def _install_bind_shim(port):
+    """
+    Makes the game's own `bind((host, port))` adopt the listening socket
+    handed over in LISTEN_FD_ENV, so unmodified `server.py <host> <port>`
+    games work. Games using netutils.listen() adopt it directly.
+    """
+    original_bind = socket.socket.bind
+
+    def bind(self, address):
+        fd = os.environ.get(netutils.LISTEN_FD_ENV)
+        if (fd is not None and self.type == socket.SOCK_STREAM and isinstance(address, tuple)
+                and len(address) >= 2 and int(address[1]) == port):
+            del os.environ[netutils.LISTEN_FD_ENV]
+            os.dup2(int(fd), self.fileno(), inheritable=False)
+            os.close(int(fd))
+            return
+        return original_bind(self, address)
+
+    socket.socket.bind = bind
+
+def run_game(script, argv, listen_fd):
+    """Runs a game script as __main__ in this process, on the given listening socket."""
+    import runpy
+
+    os.environ[netutils.LISTEN_FD_ENV] = str(listen_fd)
+    _install_bind_shim(int(argv[1]))
+
+    # Same environment as `python script host port`
+    sys.argv = [script] + argv
+    sys.path[0] = os.path.dirname(script)
+    runpy.run_path(script, run_name="__main__")
+
+def worker_main(control_fd):
+    """Waits for one job, then runs it."""
+    control = socket.socket(fileno=control_fd)
+    try:
+        message, fds, _, _ = socket.recv_fds(control, MAX_JOB_SIZE, 1)
+    except OSError:
+        return
+    finally:
+        control.close()
+    if not message or not fds:
+        return  # Runner closed
+
+    job = json.loads(message)
+    run_game(job["script"], job["argv"], fds[0])
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        # Import what games use up front, while the worker is idle
+        from tools import constants
+        import random, select, struct
+
+        worker_main(int(sys.argv[2]))
+
+    elif len(sys.argv) == 5 and sys.argv[1] == "--run":
+        # Cold start: the listening socket was inherited
+        run_game(sys.argv[2], sys.argv[3:], int(os.environ[netutils.LISTEN_FD_ENV]))
@@ -1,71 +1,841 @@
 import struct
 import socket
 import json
+import asyncio
+import weakref
+import hashlib
+import io
+import os
+import zlib
 
-def send_msg(sock, message):
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# -----------------------------------------------------------------------------
+# Frame Header
+# -----------------------------------------------------------------------------
+# Every frame starts with a 4-byte (32-bit) header in network byte order:
+#   bit  31     payload is zlib-compressed
+#   bits 30-24  codec tag (0 = JSON)
+#   bits 23-0   payload length (on the wire, i.e. after compression)
+# An uncompressed JSON frame is byte-for-byte identical to the original
+# length-prefixed format, so peers that never negotiate (e.g. uploaded games)
+# keep working. Compression is only used once both peers agreed on it.
+
+MAX_MSG_SIZE = 64 * 1024  # 65536 bytes
+LENGTH_MASK = 0xFFFFFF
+
+# Initial size of each socket's receive buffer; grows to fit larger frames
+RECV_BUFFER_SIZE = 16 * 1024
+
+# Max buffers handed to one sendmsg() call (POSIX guarantees IOV_MAX >= 16, Linux allows 1024)
+MAX_IOVECS = 512
+
+# How long a server waits for a client's hello before assuming plain JSON.
+# A legacy client that never sends one (it waits for the server to speak,
+# e.g. for a menu) gets its first reply only after this delay.
+HELLO_TIMEOUT = 1.0
+
+# Payloads smaller than this are never compressed (not worth the CPU time)
+COMPRESS_THRESHOLD = 1024
+COMPRESS_LEVEL = 6
+FLAG_COMPRESSED = 0x80
+
+# -----------------------------------------------------------------------------
+# Codecs
+# -----------------------------------------------------------------------------
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+# Not a negotiable codec: the payload is opaque bytes (file stream chunks)
+TAG_RAW = 0x0F
+
+# Format: {tag: (name, encode, decode)}
+# encode(obj) -> bytes, decode(bytes-like) -> obj
+_codecs = {}
+
+def register_codec(tag, name, encode, decode):
+    """Adds a codec that can be negotiated with register_codec's `name`."""
+    if not 0 <= tag < TAG_RAW:
+        raise ValueError(f"Codec tag must be in 0..14, got {tag}")
+    _codecs[tag] = (name, encode, decode)
+
+def available_codecs():
+    """Returns the registered codec names, most preferred first."""
+    return [_codecs[tag][0] for tag in sorted(_codecs, reverse=True)]
+
+def _codec_tag(name):
+    for tag, (codec_name, _, _) in _codecs.items():
+        if codec_name == name:
+            return tag
+    return None
+
+register_codec(
+    CODEC_JSON, "json",
+    lambda obj: json.dumps(obj, separators=(',', ':')).encode('utf-8'),
+    lambda data: json.loads(str(data, 'utf-8'))
+)
+
+if msgpack is not None:
+    register_codec(
+        CODEC_MSGPACK, "msgpack",
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False)
+    )
+
+# -----------------------------------------------------------------------------
+# Per-Connection State
+# -----------------------------------------------------------------------------
+
+class FrameReader:
+    """
+    Buffered reader for one socket. Receives with recv_into() into a reusable
+    bytearray, so one recv syscall can pick up several small frames, and
+    payloads are decoded straight out of the buffer without copying.
+    """
+    def __init__(self, sock, size=RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0  # First unread byte
+        self.end = 0    # End of received data
+
+    def _fill(self, n):
+        """
+        Makes sure at least n unread bytes are buffered.
+        Returns False on EOF or socket error.
+        """
+        if self.end - self.start >= n:
+            return True
+
+        # Make room: grow the buffer to fit the frame, or move the unread tail to the front
+        if self.start + n > len(self.buf):
+            unread = self.end - self.start
+            if n > len(self.buf):
+                new_buf = bytearray(max(n, 2 * len(self.buf)))
+                new_buf[:unread] = self.view[self.start:self.end]
+                self.view.release()
+                self.buf, self.view = new_buf, memoryview(new_buf)
+            else:
+                self.buf[:unread] = self.buf[self.start:self.end]
+            self.start, self.end = 0, unread
+
+        while self.end - self.start < n:
+            try:
+                received = self.sock.recv_into(self.view[self.end:])
+            except socket.error as e:
+                print(f"Socket error in recv: {e}")
+                return False
+            if not received:
+                return False
+            self.end += received
+        return True
+
+    def _consume(self, n):
+        """Returns a view of the next n buffered bytes and marks them as read."""
+        chunk = self.view[self.start:self.start + n]
+        self.start += n
+        if self.start == self.end:
+            self.start = self.end = 0
+        return chunk
+
+    def read_exact(self, n):
+        """Returns the next n bytes as a new bytes object, or None on EOF."""
+        if not self._fill(n):
+            return None
+        with self._consume(n) as chunk:
+            return bytes(chunk)
+
+    def read_frame(self):
+        """
+        Returns (tag, payload) for the next frame, or None on EOF.
+        The payload is a memoryview into the buffer, only valid until the next read.
+        """
+        if not self._fill(4):
+            return None
+        with self.view[self.start:self.start + 4] as prefix:
+            tag, length = parse_header(prefix)
+
+        if not self._fill(4 + length):
+            return None
+        self.start += 4
+        return tag, self._consume(length)
+
+class Session:
+    """
+    Framing state of one connection. Keyed by the socket (or, for asyncio,
+    the StreamWriter), so plain send_msg/recv_msg callers never see it.
+    """
+    def __init__(self):
+        self.codec = CODEC_JSON  # Tag used for outgoing frames
+        self.compress = False    # Compress large outgoing frames (negotiated)
+        self.reader = None       # FrameReader, created on the first blocking read
+        # Payload byte totals before compression and on the wire
+        self.stats = {"sent": 0, "sent_wire": 0, "received": 0, "received_wire": 0}
+
+_sessions = weakref.WeakKeyDictionary()
+
+def get_session(conn):
+    session = _sessions.get(conn)
+    if session is None:
+        session = Session()
+        _sessions[conn] = session
+        if isinstance(conn, socket.socket):
+            set_nodelay(conn)
+    return session
+
+def set_nodelay(sock):
     """
-    1. Serializes a Python object (message) to a JSON string.
-    2. Encodes it to bytes (UTF-8).
-    3. Prefixes it with a 4-byte (32-bit) length (network byte order).
-    4. Sends it.
+    Disables Nagle's algorithm. Every exchange here is a small request
+    followed by a small response, which Nagle + delayed ACK would stall.
+    Called automatically the first time netutils touches a socket.
+    (asyncio already sets TCP_NODELAY on its TCP transports.)
     """
-    # Convert dict/list -> json string -> binary bytes
-    json_str = json.dumps(message)
-    message_bytes = json_str.encode('utf-8')
+    if sock.family in (socket.AF_INET, socket.AF_INET6) and sock.type == socket.SOCK_STREAM:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass  # Not connected yet / already closed
+
+def get_reader(sock):
+    session = get_session(sock)
+    if session.reader is None:
+        session.reader = FrameReader(sock)
+    return session.reader
 
-    MAX_MSG_SIZE = 64 * 1024  # 65536 bytes
-    length = len(message_bytes)
-    
+def pack_frame(session, tag, payload, prefix=b""):
+    """
+    Returns the buffers of one frame: a header, then `prefix` + `payload`.
+    Payloads of at least COMPRESS_THRESHOLD bytes are compressed if the
+    session negotiated it and it actually makes them smaller.
+    """
+    length = len(prefix) + len(payload)
     if length > MAX_MSG_SIZE:
         raise ValueError(f"Message too large: {length} bytes (max {MAX_MSG_SIZE})")
-    
-    prefix = struct.pack('!I', length)
-    
+
+    totals = session.stats
+    totals["sent"] += length
+    if session.compress and length >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(prefix + payload if prefix else payload, COMPRESS_LEVEL)
+        if len(compressed) < length:
+            totals["sent_wire"] += len(compressed)
+            return [struct.pack('!I', ((tag | FLAG_COMPRESSED) << 24) | len(compressed)), compressed]
+
+    totals["sent_wire"] += length
+    return [struct.pack('!I', (tag << 24) | length) + prefix, payload]
+
+def encode_frame(session, message):
+    """
+    Encodes a message with the session's codec.
+    Returns the buffers (header, payload) ready to be written to the wire.
+    """
+    return pack_frame(session, session.codec, _codecs[session.codec][1](message))
+
+def parse_header(prefix):
+    """Returns (tag, length) for a 4-byte frame header."""
+    header = struct.unpack('!I', prefix)[0]
+    tag, length = header >> 24, header & LENGTH_MASK
+
+    if length > MAX_MSG_SIZE:
+        raise ValueError(f"Message too large: {length} bytes (max {MAX_MSG_SIZE})")
+    codec = tag & ~FLAG_COMPRESSED
+    if codec not in _codecs and codec != TAG_RAW:
+        raise ValueError(f"Unknown codec tag: {codec}")
+    return tag, length
+
+def _decompress(message_bytes):
+    """Inflates a compressed payload, refusing anything above MAX_MSG_SIZE."""
+    inflater = zlib.decompressobj()
+    try:
+        data = inflater.decompress(message_bytes, MAX_MSG_SIZE + 1)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt compressed frame: {e}")
+    if len(data) > MAX_MSG_SIZE:
+        raise ValueError(f"Message too large after decompression (max {MAX_MSG_SIZE})")
+    if not inflater.eof:
+        raise ValueError("Truncated compressed frame")
+    return data
+
+def decode_frame(session, tag, message_bytes):
+    """Decodes a payload according to the tag found in its header."""
+    totals = session.stats
+    totals["received_wire"] += len(message_bytes)
+    if tag & FLAG_COMPRESSED:
+        message_bytes = _decompress(message_bytes)
+        tag &= ~FLAG_COMPRESSED
+    totals["received"] += len(message_bytes)
+
+    if tag == TAG_RAW:
+        return bytes(message_bytes)
+    return _codecs[tag][2](message_bytes)
+
+def stats(conn):
+    """
+    Returns the payload byte totals of a connection (socket or asyncio stream):
+    "sent"/"received" before compression, "sent_wire"/"received_wire" as
+    actually transferred.
+    """
+    return dict(get_session(conn).stats)
+
+# -----------------------------------------------------------------------------
+# Blocking Sockets
+# -----------------------------------------------------------------------------
+
+def sendall_buffers(sock, buffers):
+    """
+    Writes every buffer in order using gather writes (sendmsg), so a header
+    and its payload, or a batch of frames, leave in a single syscall.
+    Falls back to one joined sendall() where sendmsg is unavailable (Windows).
+    """
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+
+    views = [memoryview(b).cast("B") for b in buffers]
+    while views:
+        sent = sock.sendmsg(views[:MAX_IOVECS])
+        # Drop fully written buffers, then trim a partially written one
+        while views and sent >= len(views[0]):
+            sent -= len(views.pop(0))
+        if sent:
+            views[0] = views[0][sent:]
+
+def send_msg(sock, message):
+    """
+    1. Serializes a Python object (message) with the connection's codec (JSON by default).
+    2. Prefixes it with a 4-byte header holding the codec tag and length (network byte order).
+    3. Sends header and payload with one gather write.
+    """
+    frame = encode_frame(get_session(sock), message)
+
     try:
-        sock.sendall(prefix)
-        sock.sendall(message_bytes)
+        sendall_buffers(sock, frame)
     except Exception as e:
         print(f"Message cannot be sent. Error: {e}")
         # We re-raise the exception so the caller knows the connection failed
         raise e
 
+def send_many(sock, messages):
+    """
+    Sends several messages as consecutive frames with a single gather write.
+    The peer reads them with recv_msg() as usual.
+    """
+    session = get_session(sock)
+    buffers = []
+    for message in messages:
+        buffers.extend(encode_frame(session, message))
+
+    try:
+        sendall_buffers(sock, buffers)
+    except Exception as e:
+        print(f"Messages cannot be sent. Error: {e}")
+        raise e
+
 def recv_msg(sock):
     """
-    Reads a message prefixed with a 4-byte (32-bit) length.
+    Reads a message prefixed with a 4-byte header (codec tag + length).
     Throws ValueError if the message length exceeds MAX_MSG_SIZE.
-    Returns the decoded Python object (from JSON), or None if the connection is closed.
+    Returns the decoded Python object, or None if the connection is closed.
     """
-    # Read the 4-byte length prefix
-    prefix = recvall(sock, 4)
-    if not prefix:
+    session = get_session(sock)
+    frame = get_reader(sock).read_frame()
+    if frame is None:
         return None  # Connection closed
 
-    length = struct.unpack('!I', prefix)[0]
-    MAX_MSG_SIZE = 64 * 1024  # 65536 bytes
-    
-    if length > MAX_MSG_SIZE:
-        raise ValueError(f"Message too large: {length} bytes (max {MAX_MSG_SIZE})")
-
-    message_bytes = recvall(sock, length)
-    if not message_bytes:
-        return None  # Connection closed unexpectedly
-    
-    # binary bytes -> json string -> dict/list
-    json_str = message_bytes.decode('utf-8')
-    return json.loads(json_str)
+    # binary bytes -> dict/list, straight from the receive buffer
+    tag, payload = frame
+    with payload:
+        return decode_frame(session, tag, payload)
 
 def recvall(sock, n):
     """
     Helper function to receive 'n' bytes or return None if EOF is hit.
+    Goes through the socket's buffered reader, so it can be mixed with recv_msg().
     """
-    data = b''
-    while len(data) < n:
-        try:
-            packet = sock.recv(n - len(data))
-            if not packet:
-                return None
-        except socket.error as e:
-            print(f"Socket error in recvall: {e}")
-            return None
-        data += packet
-    return data
\ No newline at end of file
+    return get_reader(sock).read_exact(n)
+
+def send_raw(sock, data):
+    """Sends opaque bytes as one frame; recv_msg() returns them as bytes."""
+    sendall_buffers(sock, pack_frame(get_session(sock), TAG_RAW, data))
+
+# -----------------------------------------------------------------------------
+# Game Sockets
+# -----------------------------------------------------------------------------
+
+# Set by tools/gamerunner.py: fd of a socket already listening on the game's port
+LISTEN_FD_ENV = "NETPROG_LISTEN_FD"
+
+def listen(host, port, backlog=16):
+    """
+    Returns a TCP socket listening on (host, port). A game server started by
+    the player server adopts the socket that was bound for it in advance
+    (see LISTEN_FD_ENV); anywhere else a new socket is bound.
+    """
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+        sock.set_inheritable(False)
+        if sock.getsockname()[1] == int(port):
+            return sock
+        sock.close()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, int(port)))
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+# Set by player_client when the game runs in the shared game host (tools/gamehost.py)
+ROOM_ENV = "NETPROG_ROOM"
+
+def connect(host, port):
+    """
+    Connects a game client to its game server. If the game runs in the
+    shared game host (ROOM_ENV is set), the room token is sent first so the
+    host can route the connection to the right room.
+    """
+    sock = socket.create_connection((host, int(port)))
+    room = os.environ.get(ROOM_ENV)
+    if room:
+        send_msg(sock, {"op": "join", "room": room})
+    return sock
+
+# -----------------------------------------------------------------------------
+# File Streaming
+# -----------------------------------------------------------------------------
+# Lifts the MAX_MSG_SIZE ceiling for file transfers. The sender drives:
+#   {"op": "file begin", "size": N, "chunk": C, "window": W}
+#   raw frames, each: 8-byte offset (network byte order) + up to C bytes of data
+#       after every W chunks the sender waits for {"op": "file ack", "offset": received}
+#   {"op": "file end", "sha256": hex digest of the whole file}
+# The receiver answers {"op": "file done", "status": "success" | "error", ...}.
+# Both sides touch one chunk at a time, so memory stays bounded by the chunk size.
+
+FILE_CHUNK_SIZE = 32 * 1024
+FILE_WINDOW = 8  # Chunks in flight before the sender waits for an ack
+
+# Largest file a receiver accepts (unless the caller passes another max_size),
+# and the largest chunk and window a sender may ask for
+MAX_FILE_SIZE = 64 * 1024 * 1024
+MAX_FILE_CHUNK = MAX_MSG_SIZE - 8
+MAX_FILE_WINDOW = 64
+
+def _file_params(begin):
+    """
+    Validates a sender's "file begin" and returns (size, chunk, window).
+    Raises ConnectionError if they are malformed: the chunks that follow
+    cannot be accounted for, so the connection is out of sync.
+    """
+    size, chunk, window = begin.get("size"), begin.get("chunk"), begin.get("window")
+    for name, value, limit in (("chunk", chunk, MAX_FILE_CHUNK), ("window", window, MAX_FILE_WINDOW)):
+        if type(value) is not int or not 0 < value <= limit:
+            raise ConnectionError(f"Malformed file transfer: {name} {value!r:.20}")
+    if type(size) is not int or size < 0:
+        raise ConnectionError(f"Malformed file transfer: size {size!r:.20}")
+    return size, chunk, window
+
+def _frames_before_reply(size, chunk, window):
+    """
+    Frames a send_file() sender writes before it reads the receiver's first
+    reply: a full window of chunks, or every chunk plus "file end".
+    """
+    chunks = -(-size // chunk)
+    return window if chunks >= window else chunks + 1
+
+def send_file(sock, source, chunk_size=FILE_CHUNK_SIZE, window=FILE_WINDOW):
+    """
+    Streams `source` (a file path, or bytes already in memory) to the peer,
+    which must be in recv_file(). Returns the SHA-256 hex digest.
+    Raises ConnectionError if the peer disconnects or rejects the file.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        f, size = io.BytesIO(source), len(source)
+    else:
+        f, size = open(source, "rb"), os.path.getsize(source)
+    send_msg(sock, {"op": "file begin", "size": size, "chunk": chunk_size, "window": window})
+
+    session = get_session(sock)
+    digest = hashlib.sha256()
+    offset = 0
+    with f:
+        while True:
+            # Read one window of chunks and send them with a single gather write
+            buffers = []
+            chunks = 0
+            while chunks < window:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                digest.update(data)
+                buffers += pack_frame(session, TAG_RAW, data, prefix=struct.pack('!Q', offset))
+                offset += len(data)
+                chunks += 1
+
+            if buffers:
+                sendall_buffers(sock, buffers)
+
+            # Flow control: at most `window` chunks ahead of the receiver
+            if chunks < window:
+                break
+            ack = recv_msg(sock)
+            if not ack or ack.get("op") != "file ack":
+                raise ConnectionError("File transfer aborted by peer")
+
+    send_msg(sock, {"op": "file end", "sha256": digest.hexdigest()})
+    done = recv_msg(sock)
+    if not done or done.get("status") != "success":
+        message = done.get("message") if done else "connection closed"
+        raise ConnectionError(f"File transfer failed: {message}")
+    return digest.hexdigest()
+
+def file_sha256(path):
+    """Returns the SHA-256 hex digest of a file, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def recv_file(sock, path, expected_sha256=None, max_size=MAX_FILE_SIZE):
+    """
+    Receives a file streamed by send_file() into `path`. Data is written to
+    `path + '.part'` and only renamed into place once the size and SHA-256
+    checksum match (and the checksum equals `expected_sha256`, if given,
+    e.g. the hash from the game's manifest). Returns the SHA-256 hex digest. Raises ValueError if the
+    file is rejected (corrupt, or larger than `max_size`), ConnectionError if the peer
+    disconnects or breaks the protocol.
+    """
+    begin = recv_msg(sock)
+    if begin is None:
+        raise ConnectionError("Connection closed before file transfer")
+    if not isinstance(begin, dict) or begin.get("op") != "file begin":
+        raise ValueError(f"Expected file begin, got {begin!r:.80}")
+
+    size, chunk, window = _file_params(begin)
+    if size > max_size:
+        # Refuse before anything touches the disk, then skip what is already in flight
+        error = f"File too large: {size} bytes (max {max_size})"
+        send_msg(sock, {"op": "file done", "status": "error", "message": error})
+        for _ in range(_frames_before_reply(size, chunk, window)):
+            if recv_msg(sock) is None:
+                raise ConnectionError("Connection closed during file transfer")
+        raise ValueError(error)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    part_path = path + ".part"
+    digest = hashlib.sha256()
+    offset = 0
+    chunks = 0
+    error = None
+    try:
+        with open(part_path, "wb") as f:
+            while True:
+                msg = recv_msg(sock)
+                if msg is None:
+                    raise ConnectionError("Connection closed during file transfer")
+
+                if isinstance(msg, bytes):
+                    chunk_offset = struct.unpack('!Q', msg[:8])[0]
+                    if chunk_offset != offset:
+                        error = error or f"Chunk at offset {chunk_offset}, expected {offset}"
+                    data = msg[8:]
+                    if offset + len(data) > size:
+                        send_msg(sock, {"op": "file done", "status": "error", "message": "More data than announced"})
+                        raise ConnectionError(f"Peer sent more than the announced {size} bytes")
+                    digest.update(data)
+                    f.write(data)
+                    offset += len(data)
+
+                    chunks += 1
+                    if chunks % window == 0:
+                        send_msg(sock, {"op": "file ack", "offset": offset})
+
+                elif msg.get("op") == "file end":
+                    if offset != size:
+                        error = error or f"Received {offset} of {size} bytes"
+                    elif msg.get("sha256") != digest.hexdigest():
+                        error = error or "Checksum mismatch"
+                    elif expected_sha256 and expected_sha256 != digest.hexdigest():
+                        error = error or "File does not match the expected checksum"
+                    break
+
+                else:
+                    error = error or f"Unexpected message during file transfer: {msg.get('op')}"
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    if error:
+        os.remove(part_path)
+        send_msg(sock, {"op": "file done", "status": "error", "message": error})
+        raise ValueError(error)
+
+    os.replace(part_path, path)
+    send_msg(sock, {"op": "file done", "status": "success", "sha256": digest.hexdigest()})
+    return digest.hexdigest()
+
+# -----------------------------------------------------------------------------
+# Codec Negotiation
+# -----------------------------------------------------------------------------
+# The client speaks first:  {"op": "hello", "codecs": [preferred, ..., "json"],
+#                            "compression": ["zlib"]}
+# The server answers:       {"op": "hello", "codec": chosen, "compression": "zlib" | None}
+# Both hellos are JSON frames; every later frame uses the chosen codec, and
+# large frames are compressed if both peers support it.
+
+# Set to False before connecting/accepting to never compress outgoing frames
+COMPRESSION = True
+
+def _hello():
+    return {"op": "hello", "codecs": available_codecs(),
+            "compression": ["zlib"] if COMPRESSION else []}
+
+def _choose_compression(hello):
+    return "zlib" if COMPRESSION and "zlib" in hello.get("compression", []) else None
+
+def _choose_codec(hello):
+    for name in hello.get("codecs", []):
+        if _codec_tag(name) is not None:
+            return name
+    return "json"
+
+def negotiate(sock):
+    """
+    Client side of the handshake. Call once, right after connect().
+    Returns the chosen codec name.
+    """
+    send_msg(sock, _hello())
+    reply = recv_msg(sock)
+    if not reply or reply.get("op") != "hello":
+        raise ConnectionError("Codec negotiation failed")
+
+    session = get_session(sock)
+    session.codec = _codec_tag(reply.get("codec", "json")) or CODEC_JSON
+    session.compress = reply.get("compression") == "zlib"
+    return reply.get("codec", "json")
+
+def _is_hello(msg):
+    return isinstance(msg, dict) and msg.get("op") == "hello"
+
+# -----------------------------------------------------------------------------
+# asyncio Streams
+# -----------------------------------------------------------------------------
+
+async def async_send_msg(writer, message):
+    """
+    asyncio counterpart of send_msg() for an asyncio.StreamWriter.
+    """
+    writer.writelines(encode_frame(get_session(writer), message))
+    await writer.drain()
+
+async def async_recv_msg(reader):
+    """
+    asyncio counterpart of recv_msg() for an asyncio.StreamReader.
+    Returns the decoded Python object, or None if the connection is closed.
+    """
+    try:
+        prefix = await reader.readexactly(4)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None  # Connection closed
+    return await _async_recv_rest(reader, prefix)
+
+async def _async_recv_rest(reader, prefix):
+    """Reads and decodes the rest of a frame whose 4-byte header was already read."""
+    tag, length = parse_header(prefix)
+    try:
+        message_bytes = await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None  # Connection closed
+
+    return decode_frame(get_session(reader), tag, message_bytes)
+
+async def async_send_file(reader, writer, source, chunk_size=FILE_CHUNK_SIZE, window=FILE_WINDOW):
+    """
+    asyncio counterpart of send_file(). Chunks are read from disk on the
+    loop, which is fine for the local, cached files the servers send.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        f, size = io.BytesIO(source), len(source)
+    else:
+        f, size = open(source, "rb"), os.path.getsize(source)
+    await async_send_msg(writer, {"op": "file begin", "size": size, "chunk": chunk_size, "window": window})
+
+    session = get_session(writer)
+    digest = hashlib.sha256()
+    offset = 0
+    with f:
+        while True:
+            buffers = []
+            chunks = 0
+            while chunks < window:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                digest.update(data)
+                buffers += pack_frame(session, TAG_RAW, data, prefix=struct.pack('!Q', offset))
+                offset += len(data)
+                chunks += 1
+
+            if buffers:
+                writer.writelines(buffers)
+                await writer.drain()
+
+            if chunks < window:
+                break
+            ack = await async_recv_msg(reader)
+            if not ack or ack.get("op") != "file ack":
+                raise ConnectionError("File transfer aborted by peer")
+
+    await async_send_msg(writer, {"op": "file end", "sha256": digest.hexdigest()})
+    done = await async_recv_msg(reader)
+    if not done or done.get("status") != "success":
+        message = done.get("message") if done else "connection closed"
+        raise ConnectionError(f"File transfer failed: {message}")
+    return digest.hexdigest()
+
+async def async_recv_file(reader, writer, path, expected_sha256=None, max_size=MAX_FILE_SIZE):
+    """
+    asyncio counterpart of recv_file(). Disk writes run in the default
+    executor, each chunk's write overlapping with receiving the next one,
+    so a slow disk never stalls the event loop.
+    """
+    begin = await async_recv_msg(reader)
+    if begin is None:
+        raise ConnectionError("Connection closed before file transfer")
+    if not isinstance(begin, dict) or begin.get("op") != "file begin":
+        raise ValueError(f"Expected file begin, got {begin!r:.80}")
+
+    size, chunk, window = _file_params(begin)
+    if size > max_size:
+        error = f"File too large: {size} bytes (max {max_size})"
+        await async_send_msg(writer, {"op": "file done", "status": "error", "message": error})
+        for _ in range(_frames_before_reply(size, chunk, window)):
+            if await async_recv_msg(reader) is None:
+                raise ConnectionError("Connection closed during file transfer")
+        raise ValueError(error)
+
+    directory = os.path.dirname(path)
+    if directory:
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+
+    part_path = path + ".part"
+    f = await asyncio.to_thread(open, part_path, "wb")
+    pending = None  # Write of the previous chunk, still running
+    digest = hashlib.sha256()
+    offset = 0
+    chunks = 0
+    error = None
+    try:
+        while True:
+            msg = await async_recv_msg(reader)
+            if msg is None:
+                raise ConnectionError("Connection closed during file transfer")
+
+            if isinstance(msg, bytes):
+                chunk_offset = struct.unpack('!Q', msg[:8])[0]
+                if chunk_offset != offset:
+                    error = error or f"Chunk at offset {chunk_offset}, expected {offset}"
+                data = msg[8:]
+                if offset + len(data) > size:
+                    await async_send_msg(writer, {"op": "file done", "status": "error", "message": "More data than announced"})
+                    raise ConnectionError(f"Peer sent more than the announced {size} bytes")
+                digest.update(data)
+                if pending:
+                    await pending
+                pending = asyncio.ensure_future(asyncio.to_thread(f.write, data))
+                offset += len(data)
+
+                chunks += 1
+                if chunks % window == 0:
+                    await async_send_msg(writer, {"op": "file ack", "offset": offset})
+
+            elif msg.get("op") == "file end":
+                if offset != size:
+                    error = error or f"Received {offset} of {size} bytes"
+                elif msg.get("sha256") != digest.hexdigest():
+                    error = error or "Checksum mismatch"
+                elif expected_sha256 and expected_sha256 != digest.hexdigest():
+                    error = error or "File does not match the expected checksum"
+                break
+
+            else:
+                error = error or f"Unexpected message during file transfer: {msg.get('op')}"
+
+        if pending:
+            await pending
+        await asyncio.to_thread(f.close)
+    except BaseException:
+        if pending:
+            await asyncio.wait([pending])
+        f.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    if error:
+        await asyncio.to_thread(os.remove, part_path)
+        await async_send_msg(writer, {"op": "file done", "status": "error", "message": error})
+        raise ValueError(error)
+
+    await asyncio.to_thread(os.replace, part_path, path)
+    await async_send_msg(writer, {"op": "file done", "status": "success", "sha256": digest.hexdigest()})
+    return digest.hexdigest()
+
+def _share_session(reader, writer):
+    """Lets a stream pair use one Session, so stats() covers both directions."""
+    _sessions[reader] = get_session(writer)
+
+async def async_negotiate(reader, writer):
+    """asyncio counterpart of negotiate()."""
+    _share_session(reader, writer)
+    await async_send_msg(writer, _hello())
+    reply = await async_recv_msg(reader)
+    if not reply or reply.get("op") != "hello":
+        raise ConnectionError("Codec negotiation failed")
+
+    session = get_session(writer)
+    session.codec = _codec_tag(reply.get("codec", "json")) or CODEC_JSON
+    session.compress = reply.get("compression") == "zlib"
+    return reply.get("codec", "json")
+
+async def async_accept_negotiation(reader, writer, timeout=HELLO_TIMEOUT):
+    """
+    Server side of the handshake. Call once, right after accepting.
+    Clients that do not send a hello within `timeout` keep using JSON.
+    If the first frame is not a hello it is returned so the caller can
+    process it as a normal request; otherwise returns None.
+    """
+    _share_session(reader, writer)
+    # Only the wait for the header is timed: readexactly() consumes nothing
+    # until all 4 bytes are there, so a timeout never leaves half a frame read
+    try:
+        prefix = await asyncio.wait_for(reader.readexactly(4), timeout)
+    except asyncio.TimeoutError:
+        return None
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None  # Connection closed
+    msg = await _async_recv_rest(reader, prefix)
+    if not _is_hello(msg):
+        return msg
+
+    chosen = _choose_codec(msg)
+    compression = _choose_compression(msg)
+    await async_send_msg(writer, {"op": "hello", "codec": chosen, "compression": compression})
+    session = get_session(writer)
+    session.codec = _codec_tag(chosen)
+    session.compress = compression is not None
+    return None